@@ -0,0 +1,581 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import data_processing as dp
+import eda_script_1 as eda
+
+logger = logging.getLogger(__name__)
+
+
+# Store attribute proportions of the Kaggle store.csv
+STORE_TYPE_PROBS = {'a': 0.541, 'b': 0.015, 'c': 0.133, 'd': 0.311}
+ASSORTMENT_PROBS = {'a': 0.534, 'b': 0.008, 'c': 0.458}
+# Relative sales level per store type, applied when sales are generated for given stores
+STORE_TYPE_SALES = {'a': 1.0, 'b': 1.7, 'c': 1.0, 'd': 0.95}
+
+
+def make_synthetic_stores(n_stores=1115, store_type_probs=None, assortment_probs=None,
+                          competition_distance_median=2330, competition_info_fraction=0.68,
+                          promo2_fraction=0.51, seed=42):
+    """Build a deterministic store.csv-shaped frame with configurable attribute distributions."""
+    rng = np.random.default_rng(seed)
+    store_type_probs = store_type_probs or STORE_TYPE_PROBS
+    assortment_probs = assortment_probs or ASSORTMENT_PROBS
+
+    has_competition_info = rng.random(n_stores) < competition_info_fraction
+    promo2 = (rng.random(n_stores) < promo2_fraction).astype(int)
+    stores = pd.DataFrame({
+        'Store': np.arange(1, n_stores + 1),
+        'StoreType': rng.choice(list(store_type_probs), n_stores, p=list(store_type_probs.values())),
+        'Assortment': rng.choice(list(assortment_probs), n_stores, p=list(assortment_probs.values())),
+        'CompetitionDistance': np.round(rng.lognormal(np.log(competition_distance_median), 1.2, n_stores), -1),
+        'CompetitionOpenSinceMonth': np.where(has_competition_info, rng.integers(1, 13, n_stores), np.nan),
+        'CompetitionOpenSinceYear': np.where(has_competition_info, rng.integers(2000, 2016, n_stores), np.nan),
+        'Promo2': promo2,
+        'Promo2SinceWeek': np.where(promo2 == 1, rng.integers(1, 51, n_stores), np.nan),
+        'Promo2SinceYear': np.where(promo2 == 1, rng.integers(2009, 2016, n_stores), np.nan),
+        'PromoInterval': np.where(promo2 == 1, rng.choice(dp.PROMO_INTERVAL_DTYPE.categories, n_stores), None),
+    })
+    return dp.apply_schema(stores)
+
+
+def make_synthetic_sales(n_stores=1115, n_days=942, start='2013-01-01', seed=42, stores=None):
+    """Build a deterministic Rossmann-shaped sales frame (one row per store and day).
+
+    With `stores` (e.g. from make_synthetic_stores), sales are scaled by STORE_TYPE_SALES.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=n_days, freq='D')
+    n_rows = n_stores * n_days
+
+    data = pd.DataFrame({
+        'Store': np.repeat(np.arange(1, n_stores + 1), n_days),
+        'DayOfWeek': np.tile(dates.dayofweek + 1, n_stores),
+        'Date': np.tile(dates.values, n_stores),
+        'Sales': rng.integers(0, 20000, n_rows),
+        'Customers': rng.integers(0, 2500, n_rows),
+        'Open': rng.choice([0, 1], n_rows, p=[0.17, 0.83]),
+        'Promo': rng.choice([0, 1], n_rows, p=[0.62, 0.38]),
+        'StateHoliday': rng.choice(['0', 'a', 'b', 'c'], n_rows, p=[0.97, 0.02, 0.005, 0.005]),
+        'SchoolHoliday': rng.choice([0, 1], n_rows, p=[0.82, 0.18]),
+    })
+    if stores is not None:
+        store_level = stores.set_index('Store')['StoreType'].astype(str).map(STORE_TYPE_SALES)
+        data['Sales'] = (data['Sales'] * data['Store'].map(store_level).to_numpy()).astype(np.int64)
+    return data
+
+
+def make_synthetic_dataset(n_rows, max_stores=1115, days_per_store=942, start='2013-01-01', seed=42,
+                           **store_kwargs):
+    """Sales and store frames with about `n_rows` sales rows.
+
+    Scales up the number of stores first (with `days_per_store` days each) and, once all
+    `max_stores` stores exist, the number of days.
+    """
+    n_stores = int(min(max_stores, max(1, -(-n_rows // days_per_store))))
+    n_days = int(max(-(-n_rows // n_stores), 2))
+    stores = make_synthetic_stores(n_stores, seed=seed, **store_kwargs)
+    sales = make_synthetic_sales(n_stores, n_days, start, seed, stores)
+    return dp.apply_schema(sales), stores
+
+
+def _time(func, *args, repeat=1, **kwargs):
+    """Return the best wall time of `repeat` calls and the last result."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _legacy_holiday_features(data, holidays):
+    """Reference per-row implementation that extract_features used before vectorization."""
+    days_to = data['Date'].apply(
+        lambda x: min((holiday - x).days for holiday in holidays if (holiday - x).days > 0)
+        if any((holiday - x).days > 0 for holiday in holidays) else 0
+    )
+    days_after = data['Date'].apply(
+        lambda x: min((x - holiday).days for holiday in holidays if (x - holiday).days > 0)
+        if any((x - holiday).days > 0 for holiday in holidays) else 0
+    )
+    return days_to, days_after
+
+
+def benchmark_holiday_features(n_stores=10, n_days=942, n_holidays=30, seed=42):
+    """Compare the legacy per-row holiday distances with the vectorized searchsorted engine."""
+    data = make_synthetic_sales(n_stores=n_stores, n_days=n_days, seed=seed)
+    holidays = pd.date_range('2012-12-25', periods=n_holidays, freq='35D')
+
+    legacy_time, (legacy_to, legacy_after) = _time(_legacy_holiday_features, data, holidays)
+    vector_time, vectorized = _time(dp.add_holiday_features, data.copy(), holidays, repeat=3)
+
+    if not (np.array_equal(legacy_to.to_numpy(), vectorized['DaysToHoliday'].to_numpy())
+            and np.array_equal(legacy_after.to_numpy(), vectorized['DaysAfterHoliday'].to_numpy())):
+        raise AssertionError("Vectorized holiday features differ from the legacy implementation.")
+
+    logger.info("Holiday features on %d rows: legacy %.3fs, vectorized %.4fs (%.0fx)",
+                len(data), legacy_time, vector_time, legacy_time / vector_time)
+    return {'rows': len(data), 'legacy_s': legacy_time, 'vectorized_s': vector_time,
+            'speedup': legacy_time / vector_time}
+
+
+def _legacy_new_competitors_comparison(merged_data):
+    """Reference per-store loop that analyze_new_competitors_effect used before vectorization."""
+    stores_with_na = merged_data[merged_data['CompetitionDistance'].isna()]
+    before_after_data = []
+    for store in stores_with_na['Store'].unique():
+        store_data = merged_data[merged_data['Store'] == store]
+        updated_entry = store_data[store_data['CompetitionDistance'].notna()]
+        if not updated_entry.empty:
+            update_date = updated_entry.iloc[0]['Date']
+            before_sales = store_data[store_data['Date'] < update_date]['Sales']
+            after_sales = store_data[store_data['Date'] >= update_date]['Sales']
+            before_after_data.append({'Store': store, 'Before_After': 'Before Update',
+                                      'Sales': before_sales.mean() if not before_sales.empty else 0})
+            before_after_data.append({'Store': store, 'Before_After': 'After Update',
+                                      'Sales': after_sales.mean() if not after_sales.empty else 0})
+    return pd.DataFrame(before_after_data)
+
+
+def benchmark_new_competitors(n_stores=1115, n_days=3 * 365, missing_fraction=0.3, seed=42):
+    """Compare the per-store loop with the groupby rewrite of the new-competitor comparison."""
+    rng = np.random.default_rng(seed)
+    merged = make_synthetic_sales(n_stores=n_stores, n_days=n_days, seed=seed)
+
+    # A share of stores has no CompetitionDistance until a random update day
+    distance = np.repeat(rng.uniform(20, 20000, n_stores), n_days)
+    update_day = np.where(rng.random(n_stores) < missing_fraction,
+                          rng.integers(1, n_days, n_stores), 0)
+    day = np.tile(np.arange(n_days), n_stores)
+    distance[day < np.repeat(update_day, n_days)] = np.nan
+    merged['CompetitionDistance'] = distance
+
+    legacy_time, legacy = _time(_legacy_new_competitors_comparison, merged)
+    vector_time, vectorized = _time(eda.new_competitors_sales_comparison, merged, repeat=3)
+    pd.testing.assert_frame_equal(legacy, vectorized)
+
+    logger.info("New competitors comparison on %d rows: legacy %.3fs, vectorized %.4fs (%.0fx)",
+                len(merged), legacy_time, vector_time, legacy_time / vector_time)
+    return {'rows': len(merged), 'legacy_s': legacy_time, 'vectorized_s': vector_time,
+            'speedup': legacy_time / vector_time}
+
+
+def _legacy_supervised_data(data, time_step=1):
+    """Reference loop that create_supervised_data used before sliding_window_view."""
+    X, y = [], []
+    for i in range(len(data) - time_step):
+        X.append(data[i:(i + time_step)])
+        y.append(data[i + time_step])
+    return np.array(X), np.array(y)
+
+
+def benchmark_supervised_windows(n_stores=1115, n_days=942, time_step=10, seed=42):
+    """Compare the per-store Python windowing loop with the strided per-store window views."""
+    import lstm_model as lm
+
+    data = make_synthetic_sales(n_stores=n_stores, n_days=n_days, seed=seed)
+    columns = ['Sales', 'Customers', 'Promo']
+
+    def legacy():
+        X, y = [], []
+        for _, group in data.groupby('Store'):
+            store_X, store_y = _legacy_supervised_data(group[columns].to_numpy(), time_step)
+            X.append(store_X)
+            y.append(store_y[:, 0])
+        return np.concatenate(X), np.concatenate(y)
+
+    legacy_time, (legacy_X, legacy_y) = _time(legacy)
+    vector_time, (X, y, _) = _time(lm.create_store_supervised_data, data, time_step, columns, repeat=3)
+    view_time, _ = _time(lm.store_windows, data, time_step, columns, repeat=3)
+    if not (np.array_equal(legacy_X, X) and np.array_equal(legacy_y, y)):
+        raise AssertionError("Strided windows differ from the legacy implementation.")
+
+    logger.info("Per-store windows (%s): legacy %.3fs, gathered %.4fs (%.0fx), views only %.4fs",
+                X.shape, legacy_time, vector_time, legacy_time / vector_time, view_time)
+    return {'rows': len(data), 'legacy_s': legacy_time, 'vectorized_s': vector_time,
+            'views_s': view_time, 'speedup': legacy_time / vector_time}
+
+
+def benchmark_feature_transformer(n_stores=1115, n_days=942, seed=42):
+    """Compare the DataFrame feature stages plus a refitted scaler with a fitted FeatureTransformer."""
+    from sklearn.preprocessing import StandardScaler
+
+    data = dp.apply_schema(make_synthetic_sales(n_stores=n_stores, n_days=n_days, seed=seed))
+    columns = dp.FEATURE_COLUMNS
+
+    def legacy():
+        features = dp.convert_categorical(dp.handle_missing_values(dp.extract_features(data.copy())))
+        return StandardScaler().fit_transform(features[columns])
+
+    legacy_time, expected = _time(legacy)
+    transformer = dp.FeatureTransformer().fit(data)
+    vector_time, features = _time(transformer.transform, data, repeat=3)
+    if not np.allclose(expected, features):
+        raise AssertionError("FeatureTransformer output differs from the DataFrame feature stages.")
+
+    logger.info("Feature transform (%d rows): stages %.3fs, fitted transformer %.3fs (%.1fx)",
+                len(data), legacy_time, vector_time, legacy_time / vector_time)
+    return {'rows': len(data), 'legacy_s': legacy_time, 'vectorized_s': vector_time,
+            'speedup': legacy_time / vector_time}
+
+
+def benchmark_lag_features(n_stores=1115, n_days=942, seed=42):
+    """Compare per-store pandas groupby rolling with the sorted-panel lag feature engine."""
+    import lag_features as lf
+
+    data = make_synthetic_sales(n_stores=n_stores, n_days=n_days, seed=seed)
+
+    def legacy():
+        past = data.sort_values(['Store', 'Date']).groupby('Store')['Sales'].shift(1)
+        rolling = past.groupby(data['Store']).rolling(28, min_periods=1)
+        return {stat: getattr(rolling, stat)().reset_index(level=0, drop=True).reindex(data.index)
+                for stat in lf.ROLLING_STATS}
+
+    legacy_time, expected = _time(legacy)
+    vector_time, _ = _time(lf.add_lag_features, data.copy(), lags=(), windows=(28,), ewm_spans=(),
+                           promo_column=None, repeat=3)
+    cumsum_time, features = _time(lf.add_lag_features, data.copy(), lags=(), windows=(28,), ewm_spans=(),
+                                  promo_column=None, cumsum=True, repeat=3)
+    for stat, values in expected.items():
+        if not np.allclose(features[f"SalesRoll{stat.capitalize()}28"], values, equal_nan=True):
+            raise AssertionError(f"Rolling {stat} differs from the groupby implementation.")
+
+    logger.info("Rolling 28-day features (%d rows): groupby %.3fs, padded kernels %.3fs (%.1fx), cumsum %.3fs",
+                len(data), legacy_time, vector_time, legacy_time / vector_time, cumsum_time)
+    return {'rows': len(data), 'legacy_s': legacy_time, 'vectorized_s': vector_time,
+            'cumsum_s': cumsum_time, 'speedup': legacy_time / vector_time}
+
+
+DEFAULT_SCALES = (10_000, 100_000, 1_000_000, 10_000_000)
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+
+def parse_scale(text):
+    """Parse a row count such as '100k' or '1M'."""
+    text = str(text).strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def scale_label(n_rows):
+    if n_rows >= 1_000_000 and n_rows % 1_000_000 == 0:
+        return f"{n_rows // 1_000_000}M"
+    if n_rows >= 1_000 and n_rows % 1_000 == 0:
+        return f"{n_rows // 1_000}k"
+    return str(n_rows)
+
+
+class _SuiteContext(dict):
+    """Inputs of the suite at one scale, each built on first use from _CONTEXT_BUILDERS."""
+
+    def __missing__(self, key):
+        value = self[key] = _CONTEXT_BUILDERS[key](self)
+        return value
+
+
+def _saved_model(ctx):
+    import model_training as mt
+
+    pipeline = mt.build_model_pipeline(n_estimators=10, features=dp.FeatureTransformer())
+    sample = ctx['sales'].iloc[:100_000]
+    mt.train_model(pipeline, sample, sample['Sales'])
+    return pipeline, mt.save_model(pipeline, ctx['workdir'])
+
+
+def _csv_path(ctx):
+    path = os.path.join(ctx['workdir'], f"train-{ctx['n_rows']}.csv")
+    ctx['sales'].to_csv(path, index=False)
+    return path
+
+
+_CONTEXT_BUILDERS = {
+    'dataset': lambda ctx: make_synthetic_dataset(ctx['n_rows'], seed=ctx['seed']),
+    'sales': lambda ctx: ctx['dataset'][0],
+    'stores': lambda ctx: ctx['dataset'][1],
+    'test': lambda ctx: ctx['sales'].drop(columns=['Sales', 'Customers']),
+    'csv_path': _csv_path,
+    'extracted': lambda ctx: dp.extract_features(ctx['sales'].copy()),
+    'filled': lambda ctx: dp.handle_missing_values(ctx['extracted']),
+    'converted': lambda ctx: dp.convert_categorical(ctx['filled'].copy(), dp.DUMMY_LEVELS),
+    'transformer': lambda ctx: dp.FeatureTransformer().fit(ctx['sales']),
+    'X': lambda ctx: ctx['transformer'].transform(ctx['sales']),
+    'y': lambda ctx: ctx['sales']['Sales'].to_numpy(),
+    'model': _saved_model,
+}
+
+
+def _update_features_case(ctx):
+    # Featurize the last day of every store from the state of all earlier days
+    converted = ctx['converted']
+    new_day = converted['Date'] == converted['Date'].max()
+    state = dp.feature_state(converted[~new_day])
+    return partial(dp.update_features, ctx['sales'][new_day].copy(), state)
+
+
+def _train_model_case(backend, max_rows):
+    def setup(ctx):
+        import model_training as mt
+        return partial(mt.train_model, mt.build_model_pipeline(backend, n_estimators=10),
+                       ctx['X'][:max_rows], ctx['y'][:max_rows])
+    return setup
+
+
+def _prediction_service_case(ctx):
+    import prediction_service as ps
+
+    service = ps.PredictionService(ctx['model'][1])
+    requests = [request for _, request in ctx['test'].groupby('Store', sort=False)]
+    return partial(service.predict_batch, requests)
+
+
+def _eda_case(name):
+    def setup(ctx):
+        import eda_report
+        return partial(eda_report.run_analyses, ctx['sales'], ctx['stores'], ctx['test'], analyses=[name],
+                       max_workers=1)
+    return setup
+
+
+def _drain(iterable):
+    """Consume a generator or dataset, so the timed call covers all of its work."""
+    for _ in iterable:
+        pass
+
+
+def _backtest_case(ctx):
+    import model_evaluation as me
+    import model_training as mt
+    return partial(me.backtest, mt.build_model_pipeline('hist_gradient_boosting', n_estimators=10), ctx['sales'])
+
+
+def _update_model_case(max_rows):
+    def setup(ctx):
+        import model_training as mt
+        # Grow a model trained on the earlier rows with the last tenth of them
+        X, y = ctx['X'][:max_rows], ctx['y'][:max_rows]
+        split = len(X) - max(1, len(X) // 10)
+        pipeline = mt.train_model(mt.build_model_pipeline(n_estimators=10), X[:split], y[:split])
+        return partial(mt.update_model, pipeline, X[split:], y[split:], n_new_estimators=10)
+    return setup
+
+
+def _stream_features_case(ctx):
+    chunks = [chunk.copy() for _, chunk in ctx['sales'].groupby(np.arange(len(ctx['sales'])) // 100_000)]
+    return partial(_drain, dp.stream_features(chunks))
+
+
+def _data_cache_case(func_name, warm):
+    def setup(ctx):
+        import data_cache as dc
+        cache_dir = os.path.join(ctx['workdir'], 'cache')
+        dc.clear_cache(cache_dir)
+        dc._file_hashes.clear()
+        call = partial(getattr(dc, func_name), ctx['csv_path'])
+        if func_name != 'file_hash':
+            call = partial(call, cache_dir=cache_dir)
+        if warm:
+            call()
+        return call
+    return setup
+
+
+def _lstm_case(func_name, *args):
+    def setup(ctx):
+        import lstm_model as lm
+        data = ctx['sales']
+        if func_name == 'create_supervised_data':
+            data = data[['Sales', 'Customers', 'Promo']].to_numpy()
+        elif func_name in ('prepare_time_series', 'check_stationarity'):
+            # Daily totals of the numeric columns
+            data = data[['Date', 'Sales', 'Customers']]
+            if func_name == 'check_stationarity':
+                data = lm.prepare_time_series(data)
+        return partial(getattr(lm, func_name), data, *args)
+    return setup
+
+
+def _window_dataset_case(ctx):
+    import lstm_model as lm
+    values, _, y, starts, _ = lm.store_windows(ctx['sales'], 10)
+    return lambda: _drain(lm.window_dataset(values, y, starts, 10, batch_size=256))
+
+
+def suite_cases():
+    """Benchmark name -> setup(ctx) returning the zero-argument call to time."""
+    import eda_report
+    import lag_features as lf
+    import model_evaluation as me
+    import store_forecasting as sf
+
+    cases = {
+        'data_processing.load_data': lambda ctx: partial(dp.load_data, ctx['csv_path']),
+        'data_processing.iter_data': lambda ctx: partial(_drain, dp.iter_data(ctx['csv_path'])),
+        'data_processing.extract_features': lambda ctx: partial(dp.extract_features, ctx['sales'].copy()),
+        'data_processing.handle_missing_values': lambda ctx: partial(dp.handle_missing_values, ctx['extracted']),
+        'data_processing.convert_categorical': lambda ctx: partial(dp.convert_categorical, ctx['filled'].copy(),
+                                                                   dp.DUMMY_LEVELS),
+        'data_processing.scale_features': lambda ctx: partial(dp.scale_features, ctx['converted'].copy(),
+                                                              dp.FEATURE_COLUMNS),
+        'data_processing.split_data': lambda ctx: partial(dp.split_data, ctx['converted'], dp.FEATURE_COLUMNS,
+                                                          'Sales'),
+        'data_processing.FeatureTransformer.fit': lambda ctx: partial(dp.FeatureTransformer().fit, ctx['sales']),
+        'data_processing.FeatureTransformer.transform': lambda ctx: partial(ctx['transformer'].transform,
+                                                                            ctx['sales']),
+        'data_processing.stream_features': _stream_features_case,
+        'data_processing.update_features': _update_features_case,
+        'data_cache.file_hash': _data_cache_case('file_hash', warm=False),
+        'data_cache.cached_load_data[miss]': _data_cache_case('cached_load_data', warm=False),
+        'data_cache.cached_load_data[hit]': _data_cache_case('cached_load_data', warm=True),
+        'data_cache.cached_features[miss]': _data_cache_case('cached_features', warm=False),
+        'data_cache.cached_features[hit]': _data_cache_case('cached_features', warm=True),
+        'lag_features.add_lag_features': lambda ctx: partial(lf.add_lag_features, ctx['sales'].copy()),
+        'store_forecasting.prepare_store_time_series': lambda ctx: partial(sf.prepare_store_time_series,
+                                                                           ctx['sales']),
+        'store_forecasting.analyze_stores': lambda ctx: partial(sf.analyze_stores,
+                                                                sf.prepare_store_time_series(ctx['sales'])),
+        'model_training.train_model': _train_model_case('random_forest', 1_000_000),
+        'model_training.train_model[hist_gradient_boosting]': _train_model_case('hist_gradient_boosting', None),
+        'model_training.update_model': _update_model_case(1_000_000),
+        'model_evaluation.backtest': _backtest_case,
+        'model_evaluation.evaluate_model': lambda ctx: partial(me.evaluate_model, ctx['model'][0], ctx['sales'],
+                                                               ctx['y']),
+        'model_evaluation.permutation_importance': lambda ctx: partial(me.permutation_importance, ctx['model'][0],
+                                                                       ctx['sales'], ctx['y'], n_repeats=3),
+        'prediction_service.predict_batch': _prediction_service_case,
+    }
+    cases.update({f"eda.{name}": _eda_case(name) for name in eda_report.ANALYSES})
+    try:
+        import lstm_model  # noqa: F401  (TensorFlow is optional for the suite)
+    except ImportError:
+        logger.warning("TensorFlow is not installed; skipping the lstm_model benchmarks")
+    else:
+        cases['lstm_model.prepare_time_series'] = _lstm_case('prepare_time_series')
+        cases['lstm_model.check_stationarity'] = _lstm_case('check_stationarity')
+        cases['lstm_model.create_supervised_data'] = _lstm_case('create_supervised_data', 10)
+        cases['lstm_model.store_windows'] = _lstm_case('store_windows', 10)
+        cases['lstm_model.create_store_supervised_data'] = _lstm_case('create_store_supervised_data', 10)
+        cases['lstm_model.window_dataset'] = _window_dataset_case
+    return cases
+
+
+def run_suite(scales=DEFAULT_SCALES, cases=None, repeat=3, seed=42):
+    """Time every (or each selected) pipeline function on synthetic data at each scale.
+
+    Every repeat gets fresh inputs from the case's setup, which is not timed. Returns
+    {scale label: {case name: best wall time in seconds}}.
+    """
+    import instrumentation as ins
+
+    all_cases = suite_cases()
+    selected = {name: all_cases[name] for name in (cases or all_cases)}
+    results = {}
+    previous = dict(ins._settings)
+    ins._settings['enabled'] = False  # Keep per-stage logging out of the timings
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for n_rows in scales:
+                label = scale_label(n_rows)
+                ctx = _SuiteContext(n_rows=n_rows, seed=seed, workdir=workdir)
+                results[label] = {}
+                for name, setup in selected.items():
+                    best = float('inf')
+                    for _ in range(repeat):
+                        call = setup(ctx)
+                        start = time.perf_counter()
+                        call()
+                        best = min(best, time.perf_counter() - start)
+                    results[label][name] = best
+                    logger.info("%s @ %s rows: %.4fs", name, label, best)
+    finally:
+        ins._settings.update(previous)
+    return results
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=DEFAULT_BASELINE):
+    """Write results with the environment they were measured in."""
+    baseline = {'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                                'numpy': np.__version__, 'pandas': pd.__version__, 'cpus': os.cpu_count()},
+                'results': results}
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    logger.info("Saved benchmark baseline to %s", path)
+
+
+def find_regressions(results, baseline, threshold=0.2, min_seconds=0.01):
+    """Cases more than `threshold` (relative) slower than the baseline.
+
+    Cases whose baseline is below `min_seconds` are too noisy to compare and are ignored.
+    """
+    regressions = []
+    for label, timings in results.items():
+        for name, seconds in timings.items():
+            reference = baseline['results'].get(label, {}).get(name)
+            if reference is None or reference < min_seconds:
+                continue
+            if seconds > reference * (1 + threshold):
+                regressions.append({'scale': label, 'case': name, 'baseline_s': reference, 'current_s': seconds,
+                                    'ratio': seconds / reference})
+                logger.warning("Regression: %s @ %s rows took %.4fs vs %.4fs baseline (%.2fx)",
+                               name, label, seconds, reference, seconds / reference)
+    return regressions
+
+
+def run_legacy_comparisons():
+    benchmark_holiday_features()
+    benchmark_new_competitors()
+    benchmark_supervised_windows()
+    benchmark_feature_transformer()
+    benchmark_lag_features()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the pipeline on synthetic Rossmann data and compare "
+                                                 "against a baseline.")
+    parser.add_argument('--scales', nargs='+', default=[scale_label(n) for n in DEFAULT_SCALES],
+                        help="Row counts to benchmark, e.g. 10k 1M")
+    parser.add_argument('--cases', nargs='+', help="Benchmarks to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative slowdown reported as a regression")
+    parser.add_argument('--min-seconds', type=float, default=0.01)
+    parser.add_argument('--legacy', action='store_true', help="Run the legacy-vs-vectorized comparisons instead")
+    parser.add_argument('--list', action='store_true', help="List the benchmark names and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.list:
+        print('\n'.join(suite_cases()))
+        return 0
+    if args.legacy:
+        run_legacy_comparisons()
+        return 0
+
+    results = run_suite([parse_scale(scale) for scale in args.scales], args.cases, args.repeat, args.seed)
+    if args.update_baseline or not os.path.exists(args.baseline):
+        save_baseline(results, args.baseline)
+        return 0
+    regressions = find_regressions(results, load_baseline(args.baseline), args.threshold, args.min_seconds)
+    logger.info("%d regression(s) above %.0f%%", len(regressions), args.threshold * 100)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import os
+import glob
+import hashlib
+import pickle
+import logging
+import tempfile
+
+import pyarrow.feather as feather
+
+import data_processing as dp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'rossmann')
+
+RAW_STAGES = ('load_data',)
+FEATURE_STAGES = ('load_data', 'extract_features', 'handle_missing_values', 'convert_categorical')
+
+
+# (path, size, mtime) -> content hash, so a file is hashed once per process unless it changes
+_file_hashes = {}
+
+
+def file_hash(file_path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents."""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def cache_key(file_path, stages, params=None):
+    """Key a cache entry by source content, the versions of the stages applied and their parameters."""
+    digest = hashlib.sha256(file_hash(file_path).encode())
+    for stage in stages:
+        digest.update(f"{stage}={dp.PIPELINE_VERSIONS[stage]};".encode())
+    digest.update(pickle.dumps(sorted((params or {}).items())))
+    return digest.hexdigest()[:16]
+
+
+def _entry_prefix(file_path, kind, params, cache_dir):
+    """Prefix shared by every version of one (source path, kind, params) entry."""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    source = hashlib.sha256(os.path.abspath(file_path).encode())
+    source.update(pickle.dumps(sorted((params or {}).items())))
+    return os.path.join(cache_dir, f"{stem}-{kind}-{source.hexdigest()[:12]}-")
+
+
+def _read_entry(path):
+    # The Arrow read maps the file without copying or decompressing it; to_pandas then copies the
+    # columns into a writable frame. Dtypes (category, datetime, bool, narrow ints) round-trip as stored
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def _remove(path):
+    """Delete a cache file that another process may have deleted already."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _write_entry(data, path, prefix, max_entries, cache_dir):
+    # A unique temporary file per writer, so concurrent misses of one entry never publish a
+    # half-written file
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=cache_dir)
+    os.close(fd)
+    try:
+        # Uncompressed, so reads can memory-map the file instead of decompressing it
+        data.reset_index(drop=True).to_feather(tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+
+    # Entries for the same source path, kind and params with another content hash or
+    # pipeline version are stale
+    for stale in glob.glob(glob.escape(prefix) + '*.feather'):
+        if stale != path and _remove(stale):
+            logger.info("Evicted stale cache entry %s", stale)
+    evict_lru(cache_dir, max_entries)
+
+
+def evict_lru(cache_dir=None, max_entries=32):
+    """Remove the least recently used entries beyond `max_entries`."""
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    entries = sorted(glob.glob(os.path.join(cache_dir, '*.feather')), key=os.path.getmtime, reverse=True)
+    for path in entries[max_entries:]:
+        if _remove(path):
+            logger.info("Evicted cache entry %s", path)
+
+
+def clear_cache(cache_dir=None):
+    """Delete every cache entry."""
+    for path in glob.glob(os.path.join(cache_dir or DEFAULT_CACHE_DIR, '*.feather')):
+        _remove(path)
+
+
+def _cached(file_path, kind, stages, build, params, cache_dir, max_entries):
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    prefix = _entry_prefix(file_path, kind, params, cache_dir)
+    path = f"{prefix}{cache_key(file_path, stages, params)}.feather"
+
+    if os.path.exists(path):
+        os.utime(path)  # Mark as recently used
+        logger.info("Loaded %s data for %s from cache", kind, file_path)
+        return _read_entry(path)
+
+    data = build()
+    _write_entry(data, path, prefix, max_entries, cache_dir)
+    logger.info("Cached %s data for %s at %s", kind, file_path, path)
+    return data
+
+
+def cached_load_data(file_path, cache_dir=None, max_entries=32):
+    """data_processing.load_data backed by the on-disk Feather cache."""
+    return _cached(file_path, 'raw', RAW_STAGES, lambda: dp.load_data(file_path),
+                   None, cache_dir, max_entries)
+
+
+def cached_features(file_path, cache_dir=None, max_entries=32, **feature_kwargs):
+    """Load and featurize a file (extract_features, handle_missing_values, convert_categorical) with caching."""
+    def build():
+        data = cached_load_data(file_path, cache_dir, max_entries)
+        data = dp.extract_features(data, **feature_kwargs)
+        data = dp.handle_missing_values(data)
+        return dp.convert_categorical(data)
+
+    return _cached(file_path, 'features', FEATURE_STAGES, build, feature_kwargs, cache_dir, max_entries)
@@ -1,28 +1,178 @@
+import numpy as np
 import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.preprocessing import StandardScaler
 
-def load_data(file_path):
-    data = pd.read_csv(file_path)
+from instrumentation import instrument
+
+# Bump a stage's version whenever its output changes, so cached results are invalidated
+PIPELINE_VERSIONS = {
+    'load_data': 2,
+    'extract_features': 1,
+    'handle_missing_values': 1,
+    'convert_categorical': 3,
+}
+
+# Compact dtypes for the Rossmann files: narrow ints, fixed categories for the code columns
+# (which also parses StateHoliday's mix of 0 and '0' consistently) and float32 for continuous fields.
+STATE_HOLIDAY_DTYPE = pd.CategoricalDtype(['0', 'a', 'b', 'c'])
+STORE_TYPE_DTYPE = pd.CategoricalDtype(['a', 'b', 'c', 'd'])
+ASSORTMENT_DTYPE = pd.CategoricalDtype(['a', 'b', 'c'])
+PROMO_INTERVAL_DTYPE = pd.CategoricalDtype(['Jan,Apr,Jul,Oct', 'Feb,May,Aug,Nov', 'Mar,Jun,Sept,Dec'])
+
+TRAIN_SCHEMA = {
+    'Store': 'uint16',
+    'DayOfWeek': 'int8',
+    'Sales': 'int32',
+    'Customers': 'int16',
+    'Open': 'int8',
+    'Promo': 'int8',
+    'StateHoliday': STATE_HOLIDAY_DTYPE,
+    'SchoolHoliday': 'int8',
+}
+
+TEST_SCHEMA = {
+    'Id': 'int32',
+    'Store': 'uint16',
+    'DayOfWeek': 'int8',
+    'Open': 'float32',  # Has missing values in test.csv
+    'Promo': 'int8',
+    'StateHoliday': STATE_HOLIDAY_DTYPE,
+    'SchoolHoliday': 'int8',
+}
+
+STORE_SCHEMA = {
+    'Store': 'uint16',
+    'StoreType': STORE_TYPE_DTYPE,
+    'Assortment': ASSORTMENT_DTYPE,
+    'CompetitionDistance': 'float32',
+    'CompetitionOpenSinceMonth': 'float32',
+    'CompetitionOpenSinceYear': 'float32',
+    'Promo2': 'int8',
+    'Promo2SinceWeek': 'float32',
+    'Promo2SinceYear': 'float32',
+    'PromoInterval': PROMO_INTERVAL_DTYPE,
+}
+
+def detect_schema(columns):
+    """Pick the train, test or store schema from a file's columns, restricted to those columns."""
+    columns = list(columns)
+    if 'StoreType' in columns:
+        schema = STORE_SCHEMA
+    elif 'Sales' in columns:
+        schema = TRAIN_SCHEMA
+    elif 'Id' in columns:
+        schema = TEST_SCHEMA
+    else:
+        schema = {}
+    return {column: dtype for column, dtype in schema.items() if column in columns}
+
+def read_schema(file_path):
+    """Return the detected schema for a CSV file by reading only its header."""
+    return detect_schema(pd.read_csv(file_path, nrows=0).columns)
+
+def apply_schema(data, schema=None):
+    """Cast an already loaded frame to its compact schema."""
+    schema = detect_schema(data.columns) if schema is None else schema
+    for column, dtype in schema.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Categories are strings; normalize mixed values such as 0 and '0' first
+            data[column] = data[column].astype(str).astype(dtype)
+        else:
+            data[column] = data[column].astype(dtype)
+    return data
+
+@instrument()
+def load_data(file_path, dtype=None):
+    data = pd.read_csv(file_path, dtype=read_schema(file_path) if dtype is None else dtype)
     data['Date'] = pd.to_datetime(data['Date'], errors='coerce')
     return data
 
-def extract_features(data):
+@instrument()
+def iter_data(file_path, chunksize=100_000, dtype=None):
+    """Yield the CSV as parsed frames of at most `chunksize` rows."""
+    dtype = read_schema(file_path) if dtype is None else dtype
+    for chunk in pd.read_csv(file_path, chunksize=chunksize, dtype=dtype):
+        chunk['Date'] = pd.to_datetime(chunk['Date'], errors='coerce')
+        yield chunk
+
+# Assuming a predefined list of holidays
+DEFAULT_HOLIDAYS = pd.to_datetime(['2022-01-01', '2022-12-25'])  # Add all relevant holidays
+
+_NS_PER_DAY = 86_400_000_000_000
+
+
+def _to_day_numbers(dates):
+    """Convert datetimes to int64 day numbers (days since the epoch); NaT becomes -1 with a mask."""
+    dates = pd.DatetimeIndex(dates)
+    valid = ~dates.isna()
+    days = np.full(len(dates), -1, dtype=np.int64)
+    days[valid] = dates.asi8[valid] // _NS_PER_DAY
+    return days, valid
+
+
+def build_holiday_index(holidays):
+    """Return a sorted, de-duplicated int64 day-number index for a holiday calendar."""
+    days, valid = _to_day_numbers(pd.to_datetime(holidays))
+    return np.unique(days[valid])
+
+
+def holiday_distances(dates, holiday_index):
+    """Return (days_to, days_after) the nearest holiday strictly after/before each date, 0 if none.
+
+    Uses a binary search over the sorted holiday index, so the cost is O(n log h).
+    """
+    days, valid = _to_day_numbers(dates)
+    return _day_distances(days, valid, holiday_index)
+
+
+def _day_distances(days, valid, holiday_index):
+    days_to = np.zeros(len(days), dtype=np.int64)
+    days_after = np.zeros(len(days), dtype=np.int64)
+    if len(holiday_index) == 0:
+        return days_to, days_after
+
+    nxt = np.searchsorted(holiday_index, days, side='right')
+    has_next = valid & (nxt < len(holiday_index))
+    days_to[has_next] = holiday_index[nxt[has_next]] - days[has_next]
+
+    prev = np.searchsorted(holiday_index, days, side='left') - 1
+    has_prev = valid & (prev >= 0)
+    days_after[has_prev] = days[has_prev] - holiday_index[prev[has_prev]]
+    return days_to, days_after
+
+
+def add_holiday_features(data, holidays=None, store_states=None, state_holidays=None):
+    """Add DaysToHoliday / DaysAfterHoliday columns.
+
+    `store_states` maps Store -> State and `state_holidays` maps State -> holiday dates;
+    rows whose store has a state calendar use it, all other rows use `holidays`.
+    """
+    holidays = DEFAULT_HOLIDAYS if holidays is None else holidays
+    days_to, days_after = holiday_distances(data['Date'], build_holiday_index(holidays))
+
+    if store_states is not None and state_holidays:
+        states = data['Store'].map(store_states).to_numpy()
+        for state, calendar in state_holidays.items():
+            mask = states == state
+            if mask.any():
+                days_to[mask], days_after[mask] = holiday_distances(
+                    data['Date'][mask], build_holiday_index(calendar))
+
+    data['DaysToHoliday'] = days_to
+    data['DaysAfterHoliday'] = days_after
+    return data
+
+
+@instrument()
+def extract_features(data, holidays=None, store_states=None, state_holidays=None):
     if not pd.api.types.is_datetime64_any_dtype(data['Date']):
         raise ValueError("The 'Date' column must be in datetime format.")
     
     data['Weekday'] = data['Date'].dt.weekday
-    data['IsWeekend'] = data['Weekday'].apply(lambda x: 1 if x >= 5 else 0)
-
-    # Assuming a predefined list of holidays
-    holidays = pd.to_datetime(['2022-01-01', '2022-12-25'])  # Add all relevant holidays
-    data['DaysToHoliday'] = data['Date'].apply(
-        lambda x: min((holiday - x).days for holiday in holidays if (holiday - x).days > 0)
-        if any((holiday - x).days > 0 for holiday in holidays) else 0
-    )
-    data['DaysAfterHoliday'] = data['Date'].apply(
-        lambda x: min((x - holiday).days for holiday in holidays if (x - holiday).days > 0)
-        if any((x - holiday).days > 0 for holiday in holidays) else 0
-    )
+    data['IsWeekend'] = (data['Weekday'] >= 5).astype(np.int64)
+
+    data = add_holiday_features(data, holidays, store_states, state_holidays)
 
     data['BeginningOfMonth'] = data['Date'].dt.day <= 10
     data['MidMonth'] = data['Date'].dt.day.between(11, 20)
@@ -31,30 +181,223 @@ def extract_features(data):
 
     return data
 
-def handle_missing_values(data):
+@instrument()
+def handle_missing_values(data, last_values=None):
     if data['Date'].isnull().any():
         print("Warning: There are invalid date entries in the dataset.")
-    return data.fillna(method='ffill')
+    data = data.ffill()
+    if last_values is not None:
+        # Leading gaps are filled from the last row of the previous chunk
+        data = data.fillna(last_values)
+    return data
 
-def convert_categorical(data):
+# Known levels of the one-hot encoded columns, so every file and chunk yields the same dummy columns
+DUMMY_LEVELS = {'SchoolHoliday': [0, 1]}
+
+@instrument()
+def convert_categorical(data, dummy_levels=None):
+    """Encode StateHoliday as codes and one-hot encode SchoolHoliday.
+
+    Dummy columns follow `dummy_levels` (default DUMMY_LEVELS), not the levels present in `data`,
+    so a file or chunk where a level is missing still gets its column.
+    """
     # Handle StateHoliday mapping
-    data['StateHoliday'] = data['StateHoliday'].astype(str)
-    state_holiday_mapping = {'0': 0, 'a': 1, 'b': 2, 'c': 3}
-    data['StateHoliday'] = data['StateHoliday'].map(state_holiday_mapping)
-    data['StateHoliday'].fillna(0, inplace=True)
+    if data['StateHoliday'].dtype == STATE_HOLIDAY_DTYPE:
+        # Category codes already follow the '0', 'a', 'b', 'c' mapping; missing values (-1) become 0
+        data['StateHoliday'] = data['StateHoliday'].cat.codes.clip(lower=0).astype(np.int64)
+    else:
+        data['StateHoliday'] = data['StateHoliday'].astype(str)
+        state_holiday_mapping = {'0': 0, 'a': 1, 'b': 2, 'c': 3}
+        data['StateHoliday'] = data['StateHoliday'].map(state_holiday_mapping)
+        data['StateHoliday'].fillna(0, inplace=True)
 
     # Convert other categorical variables to numeric using one-hot encoding
     categorical_columns = ['SchoolHoliday']  # Add other categorical columns if needed
+    for column, levels in (DUMMY_LEVELS if dummy_levels is None else dummy_levels).items():
+        data[column] = pd.Categorical(data[column], categories=levels)
     data = pd.get_dummies(data, columns=categorical_columns, drop_first=True)
     
     return data
 
+@instrument()
+def stream_features(chunks, **feature_kwargs):
+    """Run extract_features, handle_missing_values and convert_categorical chunk by chunk.
+
+    `chunks` is an iterable of frames (e.g. from iter_data). The forward-fill state is carried
+    across chunk boundaries and dummy columns use DUMMY_LEVELS (as convert_categorical does by
+    default), so concatenating the output matches the eager pipeline while peak memory stays
+    bounded by the chunk size.
+    """
+    last_values = None
+    for chunk in chunks:
+        chunk = extract_features(chunk, **feature_kwargs)
+        chunk = handle_missing_values(chunk, last_values)
+        last_values = chunk.iloc[-1] if len(chunk) else last_values
+        yield convert_categorical(chunk, DUMMY_LEVELS)
+
+def _unconverted(row):
+    """Undo convert_categorical on a single featurized row, for use as forward-fill values."""
+    row = row.copy()
+    if 'StateHoliday' in row.index and not isinstance(row['StateHoliday'], str):
+        row['StateHoliday'] = STATE_HOLIDAY_DTYPE.categories[int(row['StateHoliday'])]
+    for column, levels in DUMMY_LEVELS.items():
+        dummies = [f"{column}_{level}" for level in levels[1:]]
+        if column not in row.index and dummies[0] in row.index:
+            hot = [level for level, dummy in zip(levels[1:], dummies) if row[dummy]]
+            row[column] = hot[0] if hot else levels[0]
+            row = row.drop(dummies)
+    return row
+
+def _store_tail(data, history_days):
+    """Rows within the last `history_days` days of each store's history."""
+    if not history_days or data.empty:
+        return data.iloc[:0]
+    last_date = data.groupby('Store', observed=True)['Date'].transform('max')
+    return data[data['Date'] > last_date - pd.Timedelta(days=history_days)]
+
+def feature_state(featurized, history_days=0, **feature_kwargs):
+    """State for update_features, taken from an already featurized frame.
+
+    Keeps the forward-fill values of the last row, the feature parameters (so the same holiday
+    calendars are used) and the last `history_days` days of every store for per-store features
+    such as lags. The state is a plain dict and can be pickled between runs.
+    """
+    last_values = _unconverted(featurized.iloc[-1]) if len(featurized) else None
+    return {'last_values': last_values, 'history': _store_tail(featurized, history_days),
+            'history_days': history_days, 'feature_kwargs': feature_kwargs}
+
+@instrument()
+def update_features(new_rows, state, store_features=None):
+    """Featurize only newly arrived rows; returns (new featurized rows, updated state).
+
+    Matches running extract_features, handle_missing_values and convert_categorical over the
+    whole history: forward-fill continues from the previous last row and holiday proximities
+    use the same calendars. `store_features`, if given, adds per-store columns to a frame and
+    must keep its row order; it runs on the retained history plus the new rows, so lags
+    reaching back up to `history_days` are correct for the new rows.
+    """
+    data = extract_features(new_rows, **state['feature_kwargs'])
+    data = handle_missing_values(data, state['last_values'])
+    last_values = data.iloc[-1] if len(data) else state['last_values']
+    data = convert_categorical(data, DUMMY_LEVELS)
+
+    history = state['history']
+    if store_features is not None:
+        data = store_features(pd.concat([history, data], ignore_index=True)).iloc[len(history):]
+        data.index = new_rows.index
+
+    new_state = dict(state, last_values=last_values,
+                     history=_store_tail(pd.concat([history, data], ignore_index=True), state['history_days']))
+    return data, new_state
+
+@instrument()
 def scale_features(data, feature_columns):
     scaler = StandardScaler()
     # Ensure all feature columns are numeric
     data[feature_columns] = scaler.fit_transform(data[feature_columns])
     return data
 
+# Model inputs of the sales_prediction notebook
+FEATURE_COLUMNS = ['Weekday', 'IsWeekend', 'DaysToHoliday', 'DaysAfterHoliday',
+                   'BeginningOfMonth', 'MidMonth', 'EndOfMonth', 'Season', 'Open', 'Promo', 'StateHoliday']
+
+_DATE_FEATURES = {'Weekday', 'IsWeekend', 'DaysToHoliday', 'DaysAfterHoliday',
+                  'BeginningOfMonth', 'MidMonth', 'EndOfMonth', 'Season'}
+
+class FeatureTransformer(BaseEstimator, TransformerMixin):
+    """Fitted replacement for extract_features + convert_categorical + scale_features.
+
+    Takes raw frames (Date, Open, Promo, StateHoliday, ...) and returns a float64 array with
+    `columns` (default FEATURE_COLUMNS; names other than the derived features are read from
+    the frame as is). Date features match extract_features and StateHoliday uses the
+    convert_categorical codes. fit learns the holiday calendars, a median fill value per
+    column (used instead of forward-filling, so a row's features never depend on its
+    neighbours) and the StandardScaler statistics; transform is a single NumPy pass over
+    the input columns. Use it as the first step of the model pipeline so its fitted state
+    is saved with the model.
+    """
+
+    def __init__(self, columns=None, holidays=None, store_states=None, state_holidays=None, scale=True):
+        self.columns = columns
+        self.holidays = holidays
+        self.store_states = store_states
+        self.state_holidays = state_holidays
+        self.scale = scale
+
+    @instrument()
+    def fit(self, X, y=None):
+        self.columns_ = list(self.columns or FEATURE_COLUMNS)
+        self.holiday_index_ = build_holiday_index(DEFAULT_HOLIDAYS if self.holidays is None else self.holidays)
+        self.state_holiday_indexes_ = {state: build_holiday_index(calendar)
+                                       for state, calendar in (self.state_holidays or {}).items()}
+
+        features = self._features(X)
+        fill_values = np.nanmedian(features, axis=0) if len(features) else np.zeros(len(self.columns_))
+        self.fill_values_ = np.nan_to_num(fill_values)
+        np.copyto(features, self.fill_values_, where=np.isnan(features))
+        if self.scale:
+            self.mean_ = features.mean(axis=0)
+            scale = features.std(axis=0)
+            self.scale_ = np.where(scale == 0, 1.0, scale)
+        else:
+            self.mean_ = np.zeros(len(self.columns_))
+            self.scale_ = np.ones(len(self.columns_))
+        return self
+
+    def transform(self, X):
+        features = self._features(X)
+        np.copyto(features, self.fill_values_, where=np.isnan(features))
+        features -= self.mean_
+        features /= self.scale_
+        return features
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.columns_, dtype=object)
+
+    def _holiday_distances(self, X, days, valid):
+        days_to, days_after = _day_distances(days, valid, self.holiday_index_)
+        if self.store_states is not None and self.state_holiday_indexes_:
+            states = X['Store'].map(self.store_states).to_numpy()
+            for state, holiday_index in self.state_holiday_indexes_.items():
+                mask = states == state
+                if mask.any():
+                    days_to[mask], days_after[mask] = _day_distances(days[mask], valid[mask], holiday_index)
+        return days_to, days_after
+
+    def _features(self, X):
+        features = np.empty((len(X), len(self.columns_)))
+        derived = {}
+        if _DATE_FEATURES.intersection(self.columns_):
+            days, valid = _to_day_numbers(X['Date'])
+            month_start = days.astype('datetime64[D]').astype('datetime64[M]')
+            day = days - month_start.astype('datetime64[D]').astype(np.int64) + 1
+            weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+            derived = {
+                'Weekday': weekday,
+                'IsWeekend': weekday >= 5,
+                'BeginningOfMonth': day <= 10,
+                'MidMonth': (day >= 11) & (day <= 20),
+                'EndOfMonth': day > 20,
+                'Season': (month_start.astype(np.int64) % 12 + 1) % 12 // 3 + 1,
+            }
+            if {'DaysToHoliday', 'DaysAfterHoliday'}.intersection(self.columns_):
+                derived['DaysToHoliday'], derived['DaysAfterHoliday'] = self._holiday_distances(X, days, valid)
+
+        for j, column in enumerate(self.columns_):
+            if column in derived:
+                features[:, j] = derived[column]
+                features[~valid, j] = np.nan
+            elif column == 'StateHoliday':
+                values = X['StateHoliday']
+                if values.dtype != STATE_HOLIDAY_DTYPE:
+                    values = values.astype(str).astype(STATE_HOLIDAY_DTYPE)
+                # Missing or unknown values become 0, as in convert_categorical
+                features[:, j] = np.clip(values.cat.codes.to_numpy(), 0, None)
+            else:
+                features[:, j] = X[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        return features
+
+@instrument()
 def split_data(data, feature_columns, target_column):
     from sklearn.model_selection import train_test_split
     X = data[feature_columns]
@@ -0,0 +1,231 @@
+import os
+import time
+import argparse
+import logging
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+import eda_script_1 as eda
+from instrumentation import instrument, stage
+
+logger = logging.getLogger(__name__)
+
+
+def _enriched(data, cache):
+    train, store = data['train'], data['store']
+    return eda._cached(cache, ('enriched', cache.frame_key(store)), train, lambda: eda.enrich_sales(train, store))
+
+
+def _promotion_distribution(data, cache, options):
+    return {'promotion_distribution': (eda.render_promotion_distribution,
+                                       eda.promotion_distribution(data['train'], data['test']))}
+
+
+def _holiday_analysis(data, cache, options):
+    return {'holiday_analysis': (eda.render_holiday_status_sales,
+                                 eda.holiday_status_sales(data['train'], cache=cache))}
+
+
+def _seasonal_holiday_sales(data, cache, options):
+    return {'seasonal_holiday_sales': (eda.render_monthly_holiday_sales,
+                                       eda.monthly_holiday_sales(data['train'], cache))}
+
+
+def _customer_behavior(data, cache, options):
+    renderer = partial(eda.render_scatter, x='Customers', y='Sales', title='Sales vs Number of Customers',
+                       xlabel='Number of Customers', ylabel='Sales', figsize=(10, 5))
+    table = eda.scatter_table(data['train'], 'Customers', 'Sales', options['max_points'], options['scatter_mode'])
+    return {'customer_behavior': (renderer, table)}
+
+
+def _promotions(data, cache, options):
+    return {'promotions': (eda.render_promotions, eda.promotion_summary(data['train'], cache))}
+
+
+def _store_hours(data, cache, options):
+    return {'store_hours': (eda.render_open_status_sales, eda.open_status_sales(data['train'], cache))}
+
+
+def _store_opening_impact(data, cache, options):
+    return {'store_opening_impact': (eda.render_store_open_sales, eda.store_open_sales(data['train'], cache))}
+
+
+def _weekday_open_stores(data, cache, options):
+    open_all_weekdays, avg_sales = eda.weekday_open_stores(data['train'], cache)
+    return {'weekday_open_stores': (eda.render_weekday_open_stores, open_all_weekdays),
+            'weekday_open_stores_sales': (eda.render_weekday_weekend_sales, avg_sales)}
+
+
+def _promo_effectiveness(data, cache, options):
+    return {'promo_effectiveness': (eda.render_promo_sales_by_store_type,
+                                    eda.promo_sales_by_store_type(_enriched(data, cache), cache))}
+
+
+def _assortment_sales(data, cache, options):
+    return {'assortment_sales': (eda.render_assortment_sales,
+                                 eda.assortment_sales(_enriched(data, cache), cache))}
+
+
+def _competitor_distance(data, cache, options):
+    city_center, all_stores = eda.competitor_distance_tables(_enriched(data, cache), options['max_points'],
+                                                             options['scatter_mode'])
+    return {'competitor_distance_city_center': (
+                partial(eda.render_competitor_distance, scope='City Center Stores'), city_center),
+            'competitor_distance_all_stores': (
+                partial(eda.render_competitor_distance, scope='All Stores'), all_stores)}
+
+
+def _new_competitors(data, cache, options):
+    sales_comparison = eda.new_competitors_sales_comparison(_enriched(data, cache))
+    if sales_comparison.empty:
+        return {}
+    sales_comparison = sales_comparison.astype({'Store': 'category', 'Before_After': 'category'})
+    return {'new_competitors': (eda.render_new_competitors, sales_comparison)}
+
+
+# name -> (table builder, datasets it needs besides train)
+ANALYSES = {
+    'promotion_distribution': (_promotion_distribution, ('test',)),
+    'holiday_analysis': (_holiday_analysis, ()),
+    'seasonal_holiday_sales': (_seasonal_holiday_sales, ()),
+    'customer_behavior': (_customer_behavior, ()),
+    'promotions': (_promotions, ()),
+    'store_hours': (_store_hours, ()),
+    'store_opening_impact': (_store_opening_impact, ()),
+    'weekday_open_stores': (_weekday_open_stores, ()),
+    'promo_effectiveness': (_promo_effectiveness, ('store',)),
+    'assortment_sales': (_assortment_sales, ('store',)),
+    'competitor_distance': (_competitor_distance, ('store',)),
+    'new_competitors': (_new_competitors, ('store',)),
+}
+
+
+def _run_timed(name, builder, data, cache, options):
+    start = time.perf_counter()
+    with stage(f"eda_report.analysis.{name}", len(data['train'])):
+        figures = builder(data, cache, options)
+    elapsed = time.perf_counter() - start
+    logger.info("Analysis %s completed in %.3fs", name, elapsed)
+    return figures, elapsed
+
+
+@instrument()
+def run_analyses(train, store=None, test=None, analyses=None, max_workers=None, cache=None,
+                 max_points=eda.SCATTER_MAX_POINTS, scatter_mode='sample'):
+    """Compute the aggregate tables of several analyses concurrently over one shared dataset.
+
+    Analyses run in a thread pool over the same read-only frames and share an AggregateCache, so
+    parsed dates, the enriched sales frame and every groupby result are computed only once. Analyses
+    whose store or test data is missing are skipped. Returns ({figure name: (renderer, table)},
+    {analysis name: wall time in seconds}).
+    """
+    data = {'train': train, 'store': store, 'test': test}
+    cache = cache if cache is not None else eda.AggregateCache()
+    options = {'max_points': max_points, 'scatter_mode': scatter_mode}
+
+    selected = {}
+    for name in analyses or ANALYSES:
+        builder, needs = ANALYSES[name]
+        missing = [need for need in needs if data[need] is None]
+        if missing:
+            logger.info("Skipping analysis %s: no %s data", name, ', '.join(missing))
+            continue
+        selected[name] = builder
+
+    figures, timings = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {name: pool.submit(_run_timed, name, builder, data, cache, options)
+                   for name, builder in selected.items()}
+        for name, future in futures.items():
+            analysis_figures, timings[name] = future.result()
+            figures.update(analysis_figures)
+    return figures, timings
+
+
+def report_tables(train, store=None, test=None, max_points=eda.SCATTER_MAX_POINTS, scatter_mode='sample',
+                  analyses=None, max_workers=None):
+    """Compute the aggregate table behind every report figure.
+
+    Returns {figure name: (renderer, table)}. Figures that need the store or test data are skipped
+    when those frames are not given; scatter plots are reduced to at most `max_points` rows.
+    """
+    return run_analyses(train, store, test, analyses, max_workers, max_points=max_points,
+                        scatter_mode=scatter_mode)[0]
+
+
+def render_figure(name, renderer, table, output_dir, fmt='png', dpi=100):
+    """Render one figure from its precomputed table into `output_dir` and return the file path."""
+    plt.switch_backend('Agg')
+    renderer(table)
+    path = os.path.join(output_dir, f"{name}.{fmt}")
+    plt.savefig(path, dpi=dpi)
+    plt.close('all')
+    return path
+
+
+@instrument()
+def generate_report(train, store=None, test=None, output_dir='eda_report', max_points=eda.SCATTER_MAX_POINTS,
+                    scatter_mode='sample', n_jobs=1, fmt='png', dpi=100, save_tables=True, analyses=None,
+                    analysis_workers=None):
+    """Write every EDA figure (and its aggregate table as CSV) to `output_dir` without a display.
+
+    Tables are computed once in this process by run_analyses (`analysis_workers` threads, optionally
+    restricted to `analyses`); with `n_jobs` > 1 the figures are rendered in that many
+    worker processes, which only receive the small aggregate tables. Returns {figure name: path}.
+    """
+    logger.info("Generating EDA report in %s...", output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    previous_backend = plt.get_backend()
+    plt.switch_backend('Agg')
+    try:
+        figures = report_tables(train, store, test, max_points, scatter_mode, analyses, analysis_workers)
+
+        if save_tables:
+            for name, (_, table) in figures.items():
+                if isinstance(table, pd.DataFrame):
+                    keep_index = not isinstance(table.index, pd.RangeIndex)
+                    table.to_csv(os.path.join(output_dir, f"{name}.csv"), index=keep_index)
+
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                futures = {name: pool.submit(render_figure, name, renderer, table, output_dir, fmt, dpi)
+                           for name, (renderer, table) in figures.items()}
+                paths = {name: future.result() for name, future in futures.items()}
+        else:
+            paths = {name: render_figure(name, renderer, table, output_dir, fmt, dpi)
+                     for name, (renderer, table) in figures.items()}
+    finally:
+        plt.switch_backend(previous_backend)
+
+    logger.info("EDA report completed: %d figures written to %s", len(paths), output_dir)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the EDA report to files without a display.")
+    parser.add_argument('train', help="Path to train.csv")
+    parser.add_argument('--store', help="Path to store.csv")
+    parser.add_argument('--test', help="Path to test.csv")
+    parser.add_argument('--output-dir', default='eda_report')
+    parser.add_argument('--max-points', type=int, default=eda.SCATTER_MAX_POINTS,
+                        help="Row threshold above which scatter plots are reduced")
+    parser.add_argument('--scatter-mode', choices=['sample', 'binned'], default='sample')
+    parser.add_argument('--jobs', type=int, default=1, help="Number of rendering processes")
+    parser.add_argument('--analysis-workers', type=int, help="Number of threads computing the analyses")
+    parser.add_argument('--analyses', nargs='+', choices=list(ANALYSES), help="Analyses to run (default: all)")
+    parser.add_argument('--format', default='png')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    train = eda.clean_data(eda.load_data(args.train))
+    store = eda.clean_data(eda.load_data(args.store)) if args.store else None
+    test = eda.clean_data(eda.load_data(args.test)) if args.test else None
+    generate_report(train, store, test, args.output_dir, args.max_points, args.scatter_mode,
+                    args.jobs, args.format, analyses=args.analyses, analysis_workers=args.analysis_workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,58 +3,223 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import logging
+import os
+import threading
+from concurrent.futures import Future
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import data_processing as dp
+from instrumentation import instrument
 
-def load_data(data_path=None):
-    """Load a specified dataset based on the provided path."""
-    logging.info("Loading data...")
+logger = logging.getLogger(__name__)
+
+@instrument()
+def load_data(data_path=None, chunksize=None):
+    """Load a specified dataset based on the provided path.
+
+    When `chunksize` is given, an iterator of DataFrames with at most that many rows is returned.
+    """
+    logger.info("Loading data...")
     
     if data_path:
         try:
-            dataset = pd.read_csv(data_path)
-            logging.info("Data loaded successfully from %s", data_path)
+            if chunksize:
+                logger.info("Streaming data from %s in chunks of %d rows", data_path, chunksize)
+                return pd.read_csv(data_path, chunksize=chunksize, dtype=dp.read_schema(data_path))
+            dataset = pd.read_csv(data_path, dtype=dp.read_schema(data_path))
+            logger.info("Data loaded successfully from %s", data_path)
             return dataset
         except Exception as e:
-            logging.error("Error loading data from %s: %s", data_path, e)
+            logger.error("Error loading data from %s: %s", data_path, e)
             return None
     else:
-        logging.warning("No data path provided.")
+        logger.warning("No data path provided.")
         return None
 
 
+@instrument()
 def clean_data(df):
     """Clean missing values in the DataFrame."""
-    logging.info("Cleaning data...")
+    logger.info("Cleaning data...")
     
     for column in df.columns:
-        if df[column].dtype == 'object':  # Fill categorical columns with mode
+        if df[column].dtype == 'object' or isinstance(df[column].dtype, pd.CategoricalDtype):  # Fill categorical columns with mode
             df[column] = df[column].fillna(df[column].mode()[0])
         elif pd.api.types.is_numeric_dtype(df[column]):  # Fill numerical columns with median
             df[column] = df[column].fillna(df[column].median())
         else:  # Fill other types with a placeholder
             df[column] = df[column].fillna('Unknown')
+
+    # Cast to the compact schema; columns that no longer have gaps can use narrow ints
+    df = dp.apply_schema(df)
     
-    logging.info("Data cleaning completed.")
+    logger.info("Data cleaning completed.")
     return df
 
-def plot_promotion_distribution(train, test):
-    """Plot the distribution of promotions in training and test sets."""
-    logging.info("Plotting promotion distribution...")
-    plt.figure(figsize=(12, 6))
-    
+@instrument()
+def enrich_sales(train_data, store_data):
+    """Attach store attributes to every sales row once, for reuse across the store-level analyses.
+
+    Equivalent to a left merge on 'Store', but each store column is gathered with `take` through the
+    integer position of the row's store, and the sales columns are not copied.
+    """
+    logger.info("Building enriched sales frame...")
+    positions = pd.Index(store_data['Store']).get_indexer(train_data['Store'])
+
+    columns = {column: train_data[column] for column in train_data.columns}
+    for column in store_data.columns.drop('Store'):
+        values = pd.api.extensions.take(store_data[column].values, positions, allow_fill=True)
+        columns[column] = pd.Series(values, index=train_data.index, name=column)
+
+    enriched = pd.DataFrame(columns, index=train_data.index, copy=False)
+    logger.info("Enriched sales frame built.")
+    return enriched
+
+
+def _merged(train_data, store_data, merged_data):
+    """Return the shared enriched frame if one was passed, otherwise build it."""
+    return merged_data if merged_data is not None else enrich_sales(train_data, store_data)
+
+
+class AggregateCache:
+    """Thread-safe memo of aggregates and derived columns over read-only frames.
+
+    Every key is computed once; concurrent requests for a key that is being computed wait for it.
+    Cached results are shared between callers and must not be modified.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = Future()
+        if owner:
+            try:
+                entry.set_result(compute())
+            except BaseException as e:
+                entry.set_exception(e)
+        return entry.result()
+
+    def frame_key(self, df):
+        """Identify a frame in cache keys, keeping it alive so that its id is not reused."""
+        with self._lock:
+            self._frames[id(df)] = df
+        return id(df)
+
+
+def _cached(cache, key, df, compute):
+    """Compute directly without a cache, otherwise memoize under (key, frame)."""
+    if cache is None:
+        return compute()
+    return cache.get((key, cache.frame_key(df)), compute)
+
+
+def group_mean(df, by, columns='Sales', cache=None):
+    """Mean of `columns` by `by` (observed groups only), one memoized aggregate per column."""
+    by = [by] if isinstance(by, str) else list(by)
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    means = [_cached(cache, ('mean', tuple(by), column), df,
+                     lambda column=column: df.groupby(by, observed=True)[column].mean())
+             for column in columns]
+    return pd.concat(means, axis=1).reset_index()
+
+
+def parsed_dates(df, cache=None):
+    """The 'Date' column as datetimes, parsed once per frame when a cache is given."""
+    return _cached(cache, 'dates', df, lambda: pd.to_datetime(df['Date']))
+
+
+# Figure output: None shows figures interactively, a directory saves them there instead
+_figure_output = {'dir': None, 'format': 'png', 'dpi': 100}
+
+# Default row threshold above which the report downsamples or bins scatter plots
+SCATTER_MAX_POINTS = 50_000
+
+
+def set_figure_output(output_dir=None, fmt='png', dpi=100):
+    """Save figures to `output_dir` instead of showing them; pass None to show them again."""
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    _figure_output.update({'dir': output_dir, 'format': fmt, 'dpi': dpi})
+
+
+def _finish(name):
+    """Show the current figure, or save and close it when a figure output directory is set."""
+    if _figure_output['dir'] is None:
+        plt.show()
+        return None
+    path = os.path.join(_figure_output['dir'], f"{name}.{_figure_output['format']}")
+    plt.savefig(path, dpi=_figure_output['dpi'])
+    plt.close('all')
+    logger.info("Saved figure %s", path)
+    return path
+
+
+def scatter_table(df, x, y, max_points=None, mode='sample', gridsize=100):
+    """Reduce a scatter plot's rows to at most `max_points`.
+
+    Above the threshold, 'sample' keeps a reproducible random sample and 'binned' aggregates the
+    points into a gridsize x gridsize grid of counts, kept as the grid with its bin edges and as
+    the non-empty cells in 'points'.
+    """
+    if mode not in ('sample', 'binned'):
+        raise ValueError(f"Unknown scatter mode: {mode}")
+    data = df[[x, y]].dropna()
+    if max_points is None or len(data) <= max_points:
+        return {'points': data, 'binned': False, 'mean': data[y].mean()}
+
+    if mode == 'binned':
+        counts, x_edges, y_edges = np.histogram2d(data[x], data[y], bins=gridsize)
+        xi, yi = np.nonzero(counts)
+        points = pd.DataFrame({
+            x: (x_edges[xi] + x_edges[xi + 1]) / 2,
+            y: (y_edges[yi] + y_edges[yi + 1]) / 2,
+            'Count': counts[xi, yi],
+        })
+        return {'points': points, 'binned': True, 'counts': counts, 'x_edges': x_edges, 'y_edges': y_edges,
+                'mean': data[y].mean()}
+    return {'points': data.sample(n=max_points, random_state=0), 'binned': False, 'mean': data[y].mean()}
+
+
+def render_scatter(table, x, y, title, xlabel, ylabel, figsize=(10, 6), mean_line=False):
+    """Render a scatter_table as a scatter plot, or its binned counts as a 2-D histogram."""
+    plt.figure(figsize=figsize)
+    if table['binned']:
+        # Draw the grid as binned, leaving empty cells blank
+        counts = np.ma.masked_equal(table['counts'], 0)
+        plt.pcolormesh(table['x_edges'], table['y_edges'], counts.T, cmap='viridis')
+        plt.colorbar(label='Count')
+    else:
+        sns.scatterplot(x=x, y=y, data=table['points'])
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    if mean_line:
+        plt.axhline(y=table['mean'], color='r', linestyle='--', label='Mean Sales')
+        plt.legend()
+    plt.tight_layout()
+
+
+def promotion_distribution(train, test):
+    """Share of rows with and without a promotion in the training and test sets."""
     # Count distribution in training set
     train_promo_counts = train['Promo'].value_counts(normalize=True)
     test_promo_counts = test['Promo'].value_counts(normalize=True)
 
     # Create a DataFrame for easier plotting
-    promo_distribution = pd.DataFrame({
+    return pd.DataFrame({
         'Train': train_promo_counts,
         'Test': test_promo_counts
     }).fillna(0)  # Fill NaN with 0 for missing values in either dataset
 
-    # Plotting
+
+def render_promotion_distribution(promo_distribution):
+    """Draw the train vs test promotion bar chart from promotion_distribution."""
     promo_distribution.plot(kind='bar', figsize=(12, 6))
     plt.title('Promotion Distribution: Train vs Test')
     plt.xlabel('Promotion Status')
@@ -62,22 +227,25 @@ def plot_promotion_distribution(train, test):
     plt.xticks(rotation=0)  # Keep x-axis labels horizontal
     plt.legend(title='Dataset')
     plt.grid(axis='y')  # Add grid for better readability
-    plt.show()
 
-    logging.info("Promotion distribution plotted.")
 
+@instrument()
+def plot_promotion_distribution(train, test):
+    """Plot the distribution of promotions in training and test sets."""
+    logger.info("Plotting promotion distribution...")
+    render_promotion_distribution(promotion_distribution(train, test))
+    _finish('promotion_distribution')
 
-def analyze_promotions(df):
-    """Analyze the effect of promotions on sales and customer behavior."""
-    logging.info("Analyzing promotions...")
+    logger.info("Promotion distribution plotted.")
 
-    # Grouping by Promo to calculate average sales and average number of customers
-    promo_analysis = df.groupby('Promo').agg({
-        'Sales': 'mean',
-        'Customers': 'mean'
-    }).reset_index()
 
-    # Visualizing average sales with and without promo
+def promotion_summary(df, cache=None):
+    """Average sales and customers with and without promo."""
+    return group_mean(df, 'Promo', ['Sales', 'Customers'], cache)
+
+
+def render_promotions(promo_analysis):
+    """Draw average sales and customers with and without promo from promotion_summary."""
     plt.figure(figsize=(12, 6))
 
     # Bar plot for average sales and average customers
@@ -94,35 +262,41 @@ def analyze_promotions(df):
     plt.ylabel('Average Customers')
 
     plt.tight_layout()
-    plt.show()
+
+
+@instrument()
+def analyze_promotions(df):
+    """Analyze the effect of promotions on sales and customer behavior."""
+    logger.info("Analyzing promotions...")
+
+    # Visualizing average sales with and without promo
+    render_promotions(promotion_summary(df))
+    _finish('promotions')
 
     # Analyzing the impact of promotions on existing customer behavior
     existing_sales = df[df['Promo'] == 0]['Sales'].sum()
     promo_sales = df[df['Promo'] == 1]['Sales'].sum()
 
-    logging.info("Total Sales without Promo: %s", existing_sales)
-    logging.info("Total Sales with Promo: %s", promo_sales)
+    logger.info("Total Sales without Promo: %s", existing_sales)
+    logger.info("Total Sales with Promo: %s", promo_sales)
     
 
-def seasonal_analysis_with_holidays(df):
-    """Analyze seasonal effects on sales, highlighting specific holidays."""
-    logging.info("Analyzing seasonal effects with holidays...")
-    # Convert 'Date' to datetime
-    df['Date'] = pd.to_datetime(df['Date'])
-    
-    # Create a column for month
-    df['Month'] = df['Date'].dt.month
-    
-    # Create a column for holiday type
-    df['Holiday_Type'] = df['StateHoliday'].replace({'0': 'None', 'a': 'Public Holiday', 
-                                                      'b': 'Easter Holiday', 'c': 'Christmas'})
-    
-    # Calculate average sales by month and holiday type
-    month_holiday_sales = df.groupby(['Month', 'Holiday_Type'])['Sales'].mean().unstack(fill_value=0)
+HOLIDAY_TYPES = {'0': 'None', 'a': 'Public Holiday', 'b': 'Easter Holiday', 'c': 'Christmas'}
+
+
+def monthly_holiday_sales(df, cache=None):
+    """Average sales by month and holiday type (months as rows, holiday types as columns)."""
+    def compute():
+        month = parsed_dates(df, cache).dt.month.rename('Month')
+        holiday_type = df['StateHoliday'].replace(HOLIDAY_TYPES).rename('Holiday_Type')
+        return df['Sales'].groupby([month, holiday_type], observed=True).mean().unstack(fill_value=0)
+    return _cached(cache, 'monthly_holiday_sales', df, compute)
 
-    # Plotting
+
+def render_monthly_holiday_sales(month_holiday_sales):
+    """Draw average monthly sales by holiday type from monthly_holiday_sales."""
     plt.figure(figsize=(12, 6))
-    month_holiday_sales.plot(kind='bar')
+    month_holiday_sales.plot(kind='bar', ax=plt.gca())
     plt.title('Average Monthly Sales by Holiday Type')
     plt.xlabel('Month')
     plt.ylabel('Average Sales')
@@ -131,66 +305,154 @@ def seasonal_analysis_with_holidays(df):
     plt.legend(title='Holiday Type')
     plt.grid(axis='y')
     plt.tight_layout()
-    plt.show()
-    
-    logging.info("Seasonal analysis with holidays completed.")
 
-def customer_behavior_analysis(df):
-    """Analyze customer behavior in relation to sales."""
-    logging.info("Analyzing customer behavior...")
+
+@instrument()
+def seasonal_analysis_with_holidays(df):
+    """Analyze seasonal effects on sales, highlighting specific holidays."""
+    logger.info("Analyzing seasonal effects with holidays...")
+    # Convert 'Date' to datetime
+    df['Date'] = pd.to_datetime(df['Date'])
     
-    plt.figure(figsize=(10, 5))
-    sns.scatterplot(x='Customers', y='Sales', data=df)
-    plt.title('Sales vs Number of Customers')
-    plt.xlabel('Number of Customers')
-    plt.ylabel('Sales')
-    plt.show()
+    # Calculate average sales by month and holiday type
+    render_monthly_holiday_sales(monthly_holiday_sales(df))
+    _finish('seasonal_holiday_sales')
     
-    logging.info("Customer behavior analysis completed.")
+    logger.info("Seasonal analysis with holidays completed.")
 
-def store_opening_impact(df):
-    """Analyze the impact of store openings on sales."""
-    logging.info("Analyzing impact of store openings on sales...")
+@instrument()
+def customer_behavior_analysis(df, max_points=None, mode='sample'):
+    """Analyze customer behavior in relation to sales."""
+    logger.info("Analyzing customer behavior...")
     
-    opening_sales = df[df['Open'] == 1].groupby('Store')['Sales'].mean().reset_index()
+    render_scatter(scatter_table(df, 'Customers', 'Sales', max_points, mode), 'Customers', 'Sales',
+                  'Sales vs Number of Customers', 'Number of Customers', 'Sales', figsize=(10, 5))
+    _finish('customer_behavior')
     
+    logger.info("Customer behavior analysis completed.")
+
+def store_open_sales(df, cache=None):
+    """Average sales per store on days the store was open."""
+    return _cached(cache, 'store_open_sales', df,
+                   lambda: df[df['Open'] == 1].groupby('Store')['Sales'].mean().reset_index())
+
+
+def render_store_open_sales(opening_sales):
+    """Draw average sales per open store from store_open_sales."""
     plt.figure(figsize=(12, 6))
     sns.barplot(x='Store', y='Sales', data=opening_sales)
     plt.title('Average Sales by Store (Open)')
     plt.xlabel('Store')
     plt.ylabel('Average Sales')
     plt.xticks(rotation=90)
-    plt.show()
+
+
+@instrument()
+def store_opening_impact(df):
+    """Analyze the impact of store openings on sales."""
+    logger.info("Analyzing impact of store openings on sales...")
     
-    logging.info("Store opening impact analysis completed.")
+    render_store_open_sales(store_open_sales(df))
+    _finish('store_opening_impact')
     
+    logger.info("Store opening impact analysis completed.")
     
-def holiday_analysis(df):
-    """Analyze sales behavior before, during, and after holidays."""
-    logging.info("Analyzing holiday effects on sales...")
-    # Convert 'Date' to datetime
-    df['Date'] = pd.to_datetime(df['Date'])
     
-    # Identify holidays based on the 'StateHoliday' column
-    holiday_dates = df[df['StateHoliday'] != '0']['Date'].unique()
+HOLIDAY_STATUS_DEFAULT = 'Before'
+
+
+def _holiday_keys(df, group_col, window):
+    """Encode rows as int64 keys (group band + day number) so that +-window days never cross groups."""
+    dates = pd.to_datetime(df['Date'])
+    valid = dates.notna().to_numpy()
+    days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    first_day = days[valid].min() if valid.any() else 0
+    days = np.where(valid, days - first_day + window, 0)
+
+    if group_col is None:
+        groups = np.zeros(len(df), dtype=np.int64)
+        group_values = None
+    else:
+        groups, group_values = pd.factorize(df[group_col])
+        valid &= groups >= 0
+    stride = (days.max() if len(days) else 0) + window + 1
+    return groups * stride + days, valid, (first_day, window, stride, group_values)
+
+
+def build_holiday_status_lookup(df, window=1, group_col=None):
+    """Label every observed date (per `group_col` if given) as Before/During/After a holiday.
+
+    Holidays are the dates with StateHoliday != '0', within each group when `group_col` (e.g. 'Store'
+    or 'State') is set. Dates up to `window` days after a holiday are 'After', up to `window` days
+    before are 'Before' and holidays are 'During'. Where windows overlap, the holiday that appears
+    last in the frame wins, as in the original per-holiday loop. Returns a Series indexed by Date
+    (or by (group, Date)) that label_holiday_status can reuse across calls.
+    """
+    keys, valid, (first_day, window, stride, group_values) = _holiday_keys(df, group_col, window)
+
+    # Holidays in order of first appearance, then sorted for the binary search
+    holiday_mask = valid & (df['StateHoliday'] != '0').to_numpy()
+    holiday_keys = pd.unique(keys[holiday_mask])
+    order = np.argsort(holiday_keys, kind='stable')
+    sorted_keys = holiday_keys[order]
+
+    unique_keys = np.unique(keys[valid])
+    best = np.full(len(unique_keys), -1, dtype=np.int64)
+    offsets = np.zeros(len(unique_keys), dtype=np.int64)
+    for offset in range(-window, window + 1) if len(sorted_keys) else ():
+        # A holiday at (key - offset) puts this date `offset` days after it
+        targets = unique_keys - offset
+        idx = np.searchsorted(sorted_keys, targets).clip(max=len(sorted_keys) - 1)
+        found = sorted_keys[idx] == targets
+        newer = found & (order[idx] > best)
+        best[newer] = order[idx][newer]
+        offsets[newer] = offset
+
+    labels = np.where(offsets > 0, 'After', np.where(offsets < 0, 'Before', 'During')).astype(object)
+    labels[best < 0] = HOLIDAY_STATUS_DEFAULT
+
+    dates = pd.to_datetime(unique_keys % stride - window + first_day, unit='D')
+    if group_col is None:
+        index = pd.DatetimeIndex(dates, name='Date')
+    else:
+        index = pd.MultiIndex.from_arrays([group_values.take(unique_keys // stride), dates],
+                                          names=[group_col, 'Date'])
+    return pd.Series(labels, index=index, name='Holiday_Status')
 
-    # Create a new column for holiday status
-    df['Holiday_Status'] = 'Before'
-    
-    # Define time periods relative to holidays
-    for holiday in holiday_dates:
-        holiday = pd.to_datetime(holiday)
-        # Set 'During' for the holiday date
-        df.loc[df['Date'] == holiday, 'Holiday_Status'] = 'During'
-        # Set 'After' for the day after the holiday
-        df.loc[df['Date'] == holiday + pd.Timedelta(days=1), 'Holiday_Status'] = 'After'
-        # Set 'Before' for the day before the holiday
-        df.loc[df['Date'] == holiday - pd.Timedelta(days=1), 'Holiday_Status'] = 'Before'
-    
-    # Group by holiday status and calculate mean sales
-    sales_summary = df.groupby('Holiday_Status')['Sales'].mean().reset_index()
 
-    # Plotting
+def label_holiday_status(df, window=1, group_col=None, status_lookup=None):
+    """Return the Holiday_Status of every row in one vectorized pass, optionally from a prebuilt lookup."""
+    if status_lookup is None:
+        status_lookup = build_holiday_status_lookup(df, window, group_col)
+
+    dates = pd.to_datetime(df['Date'])
+    if isinstance(status_lookup.index, pd.MultiIndex):
+        row_index = pd.MultiIndex.from_arrays([df[status_lookup.index.names[0]], dates])
+    else:
+        row_index = pd.DatetimeIndex(dates)
+    positions = status_lookup.index.get_indexer(row_index)
+
+    # Position -1 (date not in the lookup) picks the appended default
+    labels = np.append(status_lookup.to_numpy(), HOLIDAY_STATUS_DEFAULT)[positions]
+    return pd.Series(labels, index=df.index, name='Holiday_Status')
+
+
+def holiday_status_sales(df, window=1, group_col=None, status_lookup=None, labels=None, cache=None):
+    """Average sales by Holiday_Status; `labels` can pass statuses already computed for `df`."""
+    def compute():
+        statuses = labels
+        if statuses is None:
+            columns = ['StateHoliday'] + ([group_col] if group_col else [])
+            dated = df[columns].assign(Date=parsed_dates(df, cache))
+            statuses = label_holiday_status(dated, window, group_col, status_lookup)
+        return df['Sales'].groupby(statuses.rename('Holiday_Status')).mean().reset_index()
+    if labels is not None or status_lookup is not None:
+        return compute()
+    return _cached(cache, ('holiday_status_sales', window, group_col), df, compute)
+
+
+def render_holiday_status_sales(sales_summary):
+    """Draw average sales before, during and after holidays from holiday_status_sales."""
     plt.figure(figsize=(10, 6))
     sns.barplot(x='Holiday_Status', y='Sales', data=sales_summary, hue='Holiday_Status', legend=False)
     
@@ -198,21 +460,31 @@ def holiday_analysis(df):
     plt.xlabel('Holiday Status')
     plt.ylabel('Average Sales')
     plt.grid(axis='y')  # Add grid for better readability
-    plt.show()
 
-    logging.info("Holiday analysis completed.")
 
-def promo_effectiveness_analysis(sales_df, store_df):
-    """Analyze the effectiveness of promotions by store type."""
-    logging.info("Analyzing promo effectiveness by store type...")
+@instrument()
+def holiday_analysis(df, window=1, group_col=None, status_lookup=None):
+    """Analyze sales behavior before, during, and after holidays."""
+    logger.info("Analyzing holiday effects on sales...")
+    # Convert 'Date' to datetime
+    df['Date'] = pd.to_datetime(df['Date'])
     
-    # Merge sales data with store data
-    merged_df = sales_df.merge(store_df, on='Store', how='left')
+    # Label each row relative to the holidays identified from the 'StateHoliday' column
+    df['Holiday_Status'] = label_holiday_status(df, window, group_col, status_lookup)
+    
+    # Group by holiday status and calculate mean sales
+    render_holiday_status_sales(holiday_status_sales(df, labels=df['Holiday_Status']))
+    _finish('holiday_analysis')
 
-    # Grouping by Promo and StoreType to calculate average sales
-    promo_sales = merged_df.groupby(['Promo', 'StoreType'])['Sales'].mean().reset_index()
+    logger.info("Holiday analysis completed.")
 
-    # Visualizing the average sales with and without promo for each store type
+def promo_sales_by_store_type(merged_data, cache=None):
+    """Average sales by Promo and StoreType."""
+    return group_mean(merged_data, ['Promo', 'StoreType'], 'Sales', cache)
+
+
+def render_promo_sales_by_store_type(promo_sales):
+    """Draw promo effectiveness by store type from promo_sales_by_store_type."""
     plt.figure(figsize=(12, 6))
     sns.barplot(x='StoreType', y='Sales', hue='Promo', data=promo_sales)
     plt.title('Promo Effectiveness by Store Type')
@@ -220,27 +492,47 @@ def promo_effectiveness_analysis(sales_df, store_df):
     plt.ylabel('Average Sales')
     plt.legend(title='Promo')
     plt.tight_layout()
-    plt.show()
+
+
+@instrument()
+def promo_effectiveness_analysis(sales_df, store_df, merged_data=None):
+    """Analyze the effectiveness of promotions by store type."""
+    logger.info("Analyzing promo effectiveness by store type...")
     
-    logging.info("Promo effectiveness analysis completed.")
+    # Merge sales data with store data
+    merged_df = _merged(sales_df, store_df, merged_data)
+
+    # Visualizing the average sales with and without promo for each store type
+    render_promo_sales_by_store_type(promo_sales_by_store_type(merged_df))
+    _finish('promo_effectiveness')
     
-def analyze_weekday_open_stores(train_data):
-    """Identify stores open on all weekdays and analyze their weekend sales."""
-    logging.info("Analyzing stores open on all weekdays and their sales...")
-    # Convert 'Date' to datetime if not already
-    train_data['Date'] = pd.to_datetime(train_data['Date'])
+    logger.info("Promo effectiveness analysis completed.")
     
-    # Extract the day of the week (0=Monday, 6=Sunday)
-    train_data['DayOfWeek'] = train_data['Date'].dt.dayofweek
+def weekday_open_stores(train_data, cache=None):
+    """Stores open on every weekday (Mon-Fri) and their average weekday and weekend sales."""
+    # Day of the week (0=Monday, 6=Sunday)
+    day_of_week = parsed_dates(train_data, cache).dt.dayofweek
     
     # Group by Store and check open status for weekdays (0-4)
-    weekday_open_stores = train_data[train_data['DayOfWeek'] < 5]  # Monday to Friday
-    open_stores = weekday_open_stores.groupby('Store')['Open'].agg(all_open='all').reset_index()
+    weekday_open = train_data[day_of_week < 5]  # Monday to Friday
+    open_stores = weekday_open.groupby('Store')['Open'].agg(all_open='all').reset_index()
     
     # Filter stores that are open all weekdays
     open_all_weekdays = open_stores[open_stores['all_open'] == True]
     
-    # Graph 1: Specific stores open on all weekdays
+    # Identify sales for these stores and split them into weekday and weekend sales
+    in_scope = train_data['Store'].isin(open_all_weekdays['Store'])
+    period = pd.Series(np.where(day_of_week[in_scope] < 5, 'Weekday', 'Weekend'),
+                       index=day_of_week[in_scope].index, name='Period')
+    sales_data = train_data.loc[in_scope, ['Store', 'Sales']]
+    
+    # Group by Period and Store to calculate average sales
+    avg_sales = sales_data.groupby([sales_data['Store'], period])['Sales'].mean().reset_index()
+    return open_all_weekdays, avg_sales
+
+
+def render_weekday_open_stores(open_all_weekdays):
+    """Draw the stores open on all weekdays from weekday_open_stores."""
     plt.figure(figsize=(10, 6))
     sns.countplot(y='Store', data=open_all_weekdays, hue='Store', palette='pastel', legend=False)
     plt.title('Stores Open on All Weekdays', fontsize=14)
@@ -248,18 +540,10 @@ def analyze_weekday_open_stores(train_data):
     plt.ylabel('Store', fontsize=12)
     plt.xticks(rotation=0)
     plt.tight_layout()
-    plt.show()
-    
-    # Identify sales for these stores
-    sales_data = train_data[train_data['Store'].isin(open_all_weekdays['Store'])]
-    
-    # Analyze weekday and weekend sales
-    sales_data.loc[:, 'Period'] = sales_data['DayOfWeek'].apply(lambda x: 'Weekday' if x < 5 else 'Weekend')
-    
-    # Group by Period and Store to calculate average sales
-    avg_sales = sales_data.groupby(['Store', 'Period'])['Sales'].mean().reset_index()
 
-    # Graph 2: Average sales comparison for stores open all weekdays
+
+def render_weekday_weekend_sales(avg_sales):
+    """Draw weekday vs weekend sales of those stores from weekday_open_stores."""
     plt.figure(figsize=(10, 6))
     sns.barplot(x='Store', y='Sales', hue='Period', data=avg_sales, palette='pastel')
     plt.title('Average Sales for Stores Open on All Weekdays', fontsize=14)
@@ -268,126 +552,182 @@ def analyze_weekday_open_stores(train_data):
     plt.xticks(rotation=45)
     plt.legend(title='Sales Period')
     plt.tight_layout()
-    plt.show()
+
+
+@instrument()
+def analyze_weekday_open_stores(train_data):
+    """Identify stores open on all weekdays and analyze their weekend sales."""
+    logger.info("Analyzing stores open on all weekdays and their sales...")
+    # Convert 'Date' to datetime if not already
+    train_data['Date'] = pd.to_datetime(train_data['Date'])
+    
+    open_all_weekdays, avg_sales = weekday_open_stores(train_data)
     
-    logging.info("Analysis on weekday and sales completed.")
+    # Graph 1: Specific stores open on all weekdays
+    render_weekday_open_stores(open_all_weekdays)
+    _finish('weekday_open_stores')
+
+    # Graph 2: Average sales comparison for stores open all weekdays
+    render_weekday_weekend_sales(avg_sales)
+    _finish('weekday_open_stores_sales')
+    
+    logger.info("Analysis on weekday and sales completed.")
     return open_all_weekdays, avg_sales
 
 
-def store_hours_analysis(df):
-    """Analyze trends during store opening and closing times."""
-    logging.info("Analyzing trends during store opening and closing times...")
-    open_sales = df.groupby('Open')['Sales'].mean().reset_index()
+def open_status_sales(df, cache=None):
+    """Average sales by store open status."""
+    return group_mean(df, 'Open', 'Sales', cache)
+
+
+def render_open_status_sales(open_sales):
+    """Draw average sales by open status from open_status_sales."""
     plt.figure(figsize=(8, 5))
     sns.barplot(x='Open', y='Sales', data=open_sales)
     plt.title('Average Sales Based on Store Open Status')
     plt.xlabel('Store Open')
     plt.ylabel('Average Sales')
-    plt.show()
 
-def analyze_assortment_effect_on_sales(store_data, train_data):
-    """Check how the assortment type affects sales."""
-    
-    # Merge store data with sales data on 'Store'
-    merged_data = pd.merge(train_data, store_data, on='Store', how='left')
 
-    # Group by Assortment and calculate average sales
-    assortment_sales = merged_data.groupby('Assortment')['Sales'].mean().reset_index()
-    
-    # Visualization of average sales by assortment type
+@instrument()
+def store_hours_analysis(df):
+    """Analyze trends during store opening and closing times."""
+    logger.info("Analyzing trends during store opening and closing times...")
+    render_open_status_sales(open_status_sales(df))
+    _finish('store_hours')
+
+def assortment_sales(merged_data, cache=None):
+    """Average sales by assortment type."""
+    return group_mean(merged_data, 'Assortment', 'Sales', cache)
+
+
+def render_assortment_sales(assortment_summary):
+    """Draw average sales by assortment type from assortment_sales."""
     plt.figure(figsize=(10, 6))
-    sns.barplot(x='Assortment', y='Sales', data=assortment_sales)
+    sns.barplot(x='Assortment', y='Sales', data=assortment_summary)
     plt.title('Average Sales by Assortment Type')
     plt.xlabel('Assortment Type')
     plt.ylabel('Average Sales')
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.show()
+
+
+@instrument()
+def analyze_assortment_effect_on_sales(store_data, train_data, merged_data=None):
+    """Check how the assortment type affects sales."""
+    
+    # Merge store data with sales data on 'Store'
+    merged_data = _merged(train_data, store_data, merged_data)
+
+    # Group by Assortment and calculate average sales
+    assortment_summary = assortment_sales(merged_data)
     
-    logging.info("Analyzing trends during store opening and closing times completed.")
-    return assortment_sales
+    # Visualization of average sales by assortment type
+    render_assortment_sales(assortment_summary)
+    _finish('assortment_sales')
+    
+    logger.info("Analyzing trends during store opening and closing times completed.")
+    return assortment_summary
+
+def city_center_sales(merged_data):
+    """Rows of city center stores (StoreType 'a') with known CompetitionDistance and Sales."""
+    # Filter for city center stores (assuming 'a' corresponds to city center stores)
+    city_center_data = merged_data[merged_data['StoreType'] == 'a']
+
+    # Remove rows with NA values in CompetitionDistance or Sales
+    return city_center_data.dropna(subset=['CompetitionDistance', 'Sales'])
+
+
+def competitor_distance_tables(merged_data, max_points=None, mode='sample'):
+    """Scatter tables of Sales vs CompetitionDistance for city center stores and for all stores."""
+    city_center = scatter_table(city_center_sales(merged_data), 'CompetitionDistance', 'Sales',
+                                max_points, mode)
+    all_stores = scatter_table(merged_data, 'CompetitionDistance', 'Sales', max_points, mode)
+    # The original plot marks the mean over all rows, including those without a distance
+    all_stores['mean'] = merged_data['Sales'].mean()
+    return city_center, all_stores
 
-def analyze_competitor_distance_effect(store_data, train_data):
+
+def render_competitor_distance(table, scope):
+    """Draw Sales vs CompetitionDistance for one of the competitor_distance_tables."""
+    render_scatter(table, 'CompetitionDistance', 'Sales',
+                  f'Sales vs. Distance to Next Competitor ({scope})',
+                  'Distance to Next Competitor (meters)', 'Sales', mean_line=True)
+
+
+@instrument()
+def analyze_competitor_distance_effect(store_data, train_data, merged_data=None, max_points=None, mode='sample'):
     """Analyze how the distance to the next competitor affects sales, focusing on city center stores."""
-    logging.info("Analyzing the distance to the next competitor affects sales...")
+    logger.info("Analyzing the distance to the next competitor affects sales...")
     # Merge store data with sales data
-    merged_data = pd.merge(train_data, store_data, on='Store', how='left')
+    merged_data = _merged(train_data, store_data, merged_data)
 
     # Convert 'Date' to datetime if not already
     merged_data['Date'] = pd.to_datetime(merged_data['Date'])
     
-    # Filter for city center stores (assuming 'a' corresponds to city center stores)
-    city_center_data = merged_data[merged_data['StoreType'] == 'a']
-
-    # Remove rows with NA values in CompetitionDistance or Sales
-    city_center_data = city_center_data.dropna(subset=['CompetitionDistance', 'Sales'])
+    city_center_table, all_stores_table = competitor_distance_tables(merged_data, max_points, mode)
 
     # Plotting the relationship for city center stores
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(x='CompetitionDistance', y='Sales', data=city_center_data)
-    plt.title('Sales vs. Distance to Next Competitor (City Center Stores)')
-    plt.xlabel('Distance to Next Competitor (meters)')
-    plt.ylabel('Sales')
-    plt.axhline(y=city_center_data['Sales'].mean(), color='r', linestyle='--', label='Mean Sales')
-    plt.legend()
-    plt.tight_layout()
-    plt.show()
+    render_competitor_distance(city_center_table, 'City Center Stores')
+    _finish('competitor_distance_city_center')
 
     # Analyze for all stores
+    render_competitor_distance(all_stores_table, 'All Stores')
+    _finish('competitor_distance_all_stores')
+    logger.info("Analyzing the distance to the next competitor affects sales completed.")
+    return city_center_sales(merged_data)
+
+def _mean_where(values, mask, groups, index):
+    """Per-group mean of `values` over rows where `mask` holds; 0 for groups with no such rows."""
+    means = values.where(mask).groupby(groups).mean()
+    counts = mask.groupby(groups).sum()
+    return means.where(counts > 0, 0).reindex(index).to_numpy(dtype=float)
+
+
+def new_competitors_sales_comparison(merged_data):
+    """Average sales before and after the first known CompetitionDistance of stores that had gaps."""
+    missing = merged_data['CompetitionDistance'].isna()
+    stores_with_na = pd.Index(merged_data.loc[missing, 'Store'].unique())
+
+    # First row, in frame order, where each of those stores has a CompetitionDistance
+    in_scope = merged_data['Store'].isin(stores_with_na)
+    updates = merged_data.loc[in_scope & ~missing, ['Store', 'Date']].drop_duplicates('Store')
+    update_dates = updates.set_index('Store')['Date']
+    stores = stores_with_na[stores_with_na.isin(update_dates.index)]
+    if stores.empty:
+        return pd.DataFrame()
+
+    scoped = merged_data.loc[merged_data['Store'].isin(stores), ['Store', 'Date', 'Sales']]
+    row_update_dates = scoped['Store'].map(update_dates)
+    before = _mean_where(scoped['Sales'], scoped['Date'] < row_update_dates, scoped['Store'], stores)
+    after = _mean_where(scoped['Sales'], scoped['Date'] >= row_update_dates, scoped['Store'], stores)
+
+    return pd.DataFrame({
+        'Store': np.repeat(stores.to_numpy(), 2),
+        'Before_After': np.tile(['Before Update', 'After Update'], len(stores)),
+        'Sales': np.column_stack([before, after]).ravel(),
+    })
+
+
+def render_new_competitors(sales_comparison):
+    """Draw sales before and after competitor updates from new_competitors_sales_comparison."""
     plt.figure(figsize=(10, 6))
-    sns.scatterplot(x='CompetitionDistance', y='Sales', data=merged_data.dropna(subset=['CompetitionDistance', 'Sales']))
-    plt.title('Sales vs. Distance to Next Competitor (All Stores)')
-    plt.xlabel('Distance to Next Competitor (meters)')
-    plt.ylabel('Sales')
-    plt.axhline(y=merged_data['Sales'].mean(), color='r', linestyle='--', label='Mean Sales')
-    plt.legend()
+    sns.barplot(x='Store', y='Sales', hue='Before_After', data=sales_comparison)
+    plt.title('Sales Before and After Competitor Distance Update')
+    plt.xlabel('Store')
+    plt.ylabel('Average Sales')
+    plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.show()
-    logging.info("Analyzing the distance to the next competitor affects sales completed.")
-    return city_center_data
 
-def analyze_new_competitors_effect(store_data, train_data):
+
+@instrument()
+def analyze_new_competitors_effect(store_data, train_data, merged_data=None):
     """Check how the opening or reopening of new competitors affects stores."""
-    logging.info("Analyzing the opening or reopening of new competitors...")
+    logger.info("Analyzing the opening or reopening of new competitors...")
     # Merge store data with sales data
-    merged_data = pd.merge(train_data, store_data, on='Store', how='left')
-
-    # Check for stores with NA CompetitionDistance initially
-    stores_with_na = merged_data[merged_data['CompetitionDistance'].isna()]
-
-    # Get unique stores that initially had NA values
-    unique_stores_with_na = stores_with_na['Store'].unique()
-
-    # Initialize a list to hold sales data for analysis
-    before_after_data = []
-
-    for store in unique_stores_with_na:
-        store_data = merged_data[merged_data['Store'] == store]
-        
-        # Get the first date when the CompetitionDistance is updated
-        updated_entry = store_data[store_data['CompetitionDistance'].notna()]
-        
-        if not updated_entry.empty:
-            update_date = updated_entry.iloc[0]['Date']
-
-            # Separate sales data before and after the update
-            before_sales = store_data[store_data['Date'] < update_date]['Sales']
-            after_sales = store_data[store_data['Date'] >= update_date]['Sales']
-
-            # Append before and after sales data
-            before_after_data.append({
-                'Store': store,
-                'Before_After': 'Before Update',
-                'Sales': before_sales.mean() if not before_sales.empty else 0
-            })
-            before_after_data.append({
-                'Store': store,
-                'Before_After': 'After Update',
-                'Sales': after_sales.mean() if not after_sales.empty else 0
-            })
-
-    # Convert the list to a DataFrame
-    sales_comparison = pd.DataFrame(before_after_data)
+    merged_data = _merged(train_data, store_data, merged_data)
+
+    sales_comparison = new_competitors_sales_comparison(merged_data)
 
     # Check if sales_comparison is empty
     if sales_comparison.empty:
@@ -399,14 +739,8 @@ def analyze_new_competitors_effect(store_data, train_data):
     sales_comparison['Before_After'] = sales_comparison['Before_After'].astype('category')
 
     # Visualization of sales before and after the distance update
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x='Store', y='Sales', hue='Before_After', data=sales_comparison)
-    plt.title('Sales Before and After Competitor Distance Update')
-    plt.xlabel('Store')
-    plt.ylabel('Average Sales')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+    render_new_competitors(sales_comparison)
+    _finish('new_competitors')
     
-    logging.info("Analyzing the opening or reopening of new competitors completed.")
-    return sales_comparison
\ No newline at end of file
+    logger.info("Analyzing the opening or reopening of new competitors completed.")
+    return sales_comparison
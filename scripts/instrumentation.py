@@ -0,0 +1,163 @@
+import json
+import time
+import inspect
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_settings = {'enabled': False, 'trace_file': None}
+_trace_lock = threading.Lock()
+_local = threading.local()
+
+
+def configure(enabled=True, trace_file=None, trace_memory=False):
+    """Switch stage instrumentation on or off; it is off until this is called.
+
+    With `trace_file`, every stage record is also appended to that file as one JSON object per
+    line. `trace_memory` starts tracemalloc so records include the peak Python allocation of each
+    stage (this slows allocation-heavy code down noticeably).
+    """
+    _settings['enabled'] = enabled
+    _settings['trace_file'] = trace_file
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def _rows(obj):
+    """Row count of a frame, series or array (or the first element of a tuple of them)."""
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    shape = getattr(obj, 'shape', None)
+    if shape:
+        return shape[0]
+    return None
+
+
+def _mb(value):
+    return 'n/a' if value is None else f"{value:.1f} MB"
+
+
+def _input_rows(args):
+    """Rows of the first frame or array among the leading arguments (skipping `self`)."""
+    return next((rows for rows in map(_rows, args[:2]) if rows is not None), None)
+
+
+def _emit(record):
+    logger.info("Stage %s: wall %.3fs, cpu %.3fs, peak RSS %s (+%s), traced peak %s, rows %s -> %s",
+                record['stage'], record['wall_s'], record['cpu_s'], _mb(record['peak_rss_mb']),
+                _mb(record['rss_growth_mb']), _mb(record['traced_peak_mb']), record['rows_in'], record['rows_out'])
+    if _settings['trace_file']:
+        with _trace_lock, open(_settings['trace_file'], 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """Measure a block of code as one pipeline stage.
+
+    Yields the stage's record; set record['rows_out'] inside the block to report output rows.
+    Wall and CPU time, peak RSS (the process high-water mark and its growth during the stage)
+    and, when tracemalloc is tracing, the stage's peak traced allocation are logged on exit.
+    """
+    record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+    if not _settings['enabled']:
+        yield record
+        return
+
+    stack = _local.__dict__.setdefault('stack', [])
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # The parent's peak so far must survive the reset below
+        if stack:
+            stack[-1]['_traced_peak'] = max(stack[-1].get('_traced_peak', 0), tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    stack.append(record)
+    rss_before = _peak_rss_mb()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['wall_s'] = time.perf_counter() - wall_start
+        record['cpu_s'] = time.process_time() - cpu_start
+        record['peak_rss_mb'] = _peak_rss_mb()
+        record['rss_growth_mb'] = None if rss_before is None else record['peak_rss_mb'] - rss_before
+        stack.pop()
+        traced_peak = None
+        if tracing and tracemalloc.is_tracing():
+            traced_peak = max(record.pop('_traced_peak', 0), tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]['_traced_peak'] = max(stack[-1].get('_traced_peak', 0), traced_peak)
+            traced_peak /= 1024 ** 2
+        record['traced_peak_mb'] = traced_peak
+        _emit(record)
+
+
+def instrument(name=None):
+    """Decorator recording each call of a function as a stage (see `stage`).
+
+    Input rows are taken from the first frame or array among the leading arguments and output
+    rows from the result. For generator functions one record covers the whole iteration: times
+    add up the work done inside the generator, output rows are summed over the yielded chunks
+    and no traced peak is reported.
+    """
+    def decorator(func):
+        stage_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not _settings['enabled']:
+                    yield from func(*args, **kwargs)
+                    return
+                # Only time spent producing items counts, not the consumer's work between them
+                record = {'stage': stage_name, 'rows_in': _input_rows(args), 'rows_out': 0}
+                rss_before = _peak_rss_mb()
+                wall = cpu = 0.0
+                iterator = func(*args, **kwargs)
+                try:
+                    while True:
+                        wall_start, cpu_start = time.perf_counter(), time.process_time()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            break
+                        finally:
+                            wall += time.perf_counter() - wall_start
+                            cpu += time.process_time() - cpu_start
+                        record['rows_out'] += _rows(item) or 0
+                        yield item
+                finally:
+                    iterator.close()
+                    peak_rss = _peak_rss_mb()
+                    record.update({'wall_s': wall, 'cpu_s': cpu, 'peak_rss_mb': peak_rss,
+                                   'rss_growth_mb': None if rss_before is None else peak_rss - rss_before,
+                                   'traced_peak_mb': None})
+                    _emit(record)
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name, _input_rows(args)) as record:
+                result = func(*args, **kwargs)
+                record['rows_out'] = _rows(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,152 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+ROLLING_STATS = ('mean', 'std', 'min', 'max')
+
+
+def _store_grid(data, store_column, date_column):
+    """Lay every store out on a daily grid from its first to its last date.
+
+    Returns (grid position of each row with a valid date, mask of those rows, store of each grid
+    day, grid start of each grid day's store, day offset within the store). Days without a row
+    stay empty on the grid, so offsets along it are calendar days.
+    """
+    dates = data[date_column].to_numpy().astype('datetime64[D]')
+    valid = ~np.isnat(dates)
+    days = dates[valid].astype(np.int64)
+    stores = data[store_column].to_numpy()[valid]
+    order = np.lexsort((days, stores))
+    sorted_stores, sorted_days = stores[order], days[order]
+
+    is_start = np.r_[True, sorted_stores[1:] != sorted_stores[:-1]] if len(order) else np.zeros(0, bool)
+    is_end = np.r_[is_start[1:], True] if len(order) else is_start
+    first_days, lengths = sorted_days[is_start], sorted_days[is_end] - sorted_days[is_start] + 1
+    grid_starts = np.r_[0, np.cumsum(lengths)[:-1]].astype(np.int64)
+
+    group_ids = np.cumsum(is_start) - 1
+    row_positions = np.empty(len(order), dtype=np.int64)
+    row_positions[order] = grid_starts[group_ids] + sorted_days - first_days[group_ids]
+
+    grid_group_ids = np.repeat(np.arange(len(lengths)), lengths)
+    grid_group_starts = grid_starts[grid_group_ids]
+    return row_positions, valid, grid_group_ids, grid_group_starts, np.arange(len(grid_group_ids)) - grid_group_starts
+
+
+def _lagged(values, lag, position):
+    """Shift grid values by `lag` days within each store; the first `lag` days of a store are NaN."""
+    out = np.full(len(values), np.nan)
+    if lag < len(values):
+        out[lag:] = values[:len(values) - lag]
+    out[position < lag] = np.nan
+    return out
+
+
+def _padded_rolling(values, group_ids, window, pad, stats):
+    """Rolling statistics over one pass of pandas' rolling kernels.
+
+    Each store is preceded by `pad` >= window - 1 NaNs, so no window reaches into the previous store.
+    """
+    n_groups = group_ids[-1] + 1 if len(group_ids) else 0
+    positions = np.arange(len(values)) + (group_ids + 1) * pad
+    padded = np.full(len(values) + n_groups * pad, np.nan)
+    padded[positions] = values
+    rolling = pd.Series(padded).rolling(window, min_periods=1)
+    return {stat: getattr(rolling, stat)().to_numpy()[positions] for stat in stats}
+
+
+def _cumsum_rolling(values, group_starts, window, stats):
+    """Rolling mean/std from prefix sums: O(n) for any window size, slightly less precise for std."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    sums = np.r_[0.0, np.cumsum(filled)]
+    squares = np.r_[0.0, np.cumsum(filled * filled)]
+    counts = np.r_[0, np.cumsum(valid)]
+
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, group_starts)
+    total = sums[end] - sums[start]
+    count = (counts[end] - counts[start]).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = {'mean': np.where(count > 0, total / count, np.nan)}
+        if 'std' in stats:
+            variance = (squares[end] - squares[start] - total * total / count) / (count - 1)
+            result['std'] = np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+    return {stat: result[stat] for stat in stats}
+
+
+def _run_lengths(flags, position):
+    """Consecutive flagged days up to and including each day, restarting at every store."""
+    index = np.arange(len(flags))
+    breaks = np.where(~flags, index, np.where(position == 0, index - 1, -1))
+    return np.where(flags, index - np.maximum.accumulate(breaks), 0)
+
+
+def add_lag_features(data, column='Sales', lags=(1, 7, 14), windows=(7, 28), stats=ROLLING_STATS,
+                     ewm_spans=(7,), shift=1, promo_column='Promo', cumsum=False,
+                     store_column='Store', date_column='Date'):
+    """Add per-store lag, rolling-window, EWM and promo-run features to a Store/Date panel.
+
+    Each store is laid out once on a daily grid from its first to its last date and every
+    feature is computed along the grids, restarting at each store, so nothing leaks across
+    stores. Lags and windows count calendar days: a day without a row (stores can miss months
+    of data) gives NaN lags, is left out of rolling and EWM statistics and ends a promo run.
+    Rolling and EWM features only see values at least `shift` days back, so with the default
+    of 1 they never include the current day's `column`. With `cumsum`, rolling means and stds
+    use prefix sums instead of the rolling kernels. Adds columns such as SalesLag7,
+    SalesRollMean28, SalesEwm7 and PromoRun; rows keep their order and rows without a valid
+    date get NaN features.
+    """
+    row_positions, valid, group_ids, group_starts, position = _store_grid(data, store_column, date_column)
+    values = np.full(len(group_ids), np.nan)
+    values[row_positions] = data[column].to_numpy(dtype=np.float64)[valid]
+    features = {}
+
+    for lag in lags:
+        features[f"{column}Lag{lag}"] = _lagged(values, lag, position)
+
+    past = _lagged(values, shift, position) if shift else values
+    pad = max(windows, default=1) - 1
+    for window in windows:
+        fast = [stat for stat in stats if stat in ('mean', 'std')] if cumsum else []
+        rolled = _cumsum_rolling(past, group_starts, window, fast) if fast else {}
+        rolled.update(_padded_rolling(past, group_ids, window, pad, [stat for stat in stats if stat not in rolled]))
+        for stat in stats:
+            features[f"{column}Roll{stat.capitalize()}{window}"] = rolled[stat]
+
+    for span in ewm_spans:
+        ewm = pd.Series(past).groupby(group_ids, sort=False).ewm(span=span).mean()
+        features[f"{column}Ewm{span}"] = ewm.to_numpy()
+
+    if promo_column is not None and promo_column in data.columns:
+        flags = np.zeros(len(group_ids), dtype=bool)
+        flags[row_positions] = data[promo_column].to_numpy()[valid] == 1
+        features[f"{promo_column}Run"] = _run_lengths(flags, position)
+
+    for name, grid_values in features.items():
+        out = np.full(len(data), np.nan) if not valid.all() else np.empty(len(data), dtype=grid_values.dtype)
+        out[valid] = grid_values[row_positions]
+        data[name] = out
+    return data
+
+
+def required_history(lags=(1, 7, 14), windows=(7, 28), ewm_spans=(7,), shift=1, ewm_horizon=5):
+    """Days of per-store history needed to compute the features of a new day.
+
+    EWM features are exact only with the full history; keeping `ewm_horizon` spans of it
+    bounds the weight of the dropped values to about exp(-2 * ewm_horizon).
+    """
+    needed = [max(lags, default=0)]
+    needed += [window + shift - 1 for window in windows]
+    needed += [ewm_horizon * span + shift for span in ewm_spans]
+    return max(needed)
+
+
+def lag_feature_func(**params):
+    """add_lag_features with fixed parameters, for data_processing.update_features.
+
+    Pass required_history(...) with the same parameters as `history_days` to
+    data_processing.feature_state.
+    """
+    return partial(add_lag_features, **params)
@@ -1,22 +1,86 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from statsmodels.tsa.stattools import adfuller
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense
 
+from instrumentation import instrument
+
+@instrument()
 def prepare_time_series(data):
     data = data.set_index('Date').resample('D').sum().fillna(0)
     return data
 
+@instrument()
 def check_stationarity(data):
     result = adfuller(data['Sales'])
     return result[1] < 0.05  # p-value < 0.05 means stationary
 
+def sliding_windows(data, time_step=1):
+    """Zero-copy windows over `data` and the value that follows each window.
+
+    Returns read-only views: X of shape (samples, time_step) for 1-D input or
+    (samples, time_step, features) for 2-D input, and y of shape (samples,) or (samples, features).
+    """
+    data = np.asarray(data)
+    if len(data) <= time_step:
+        return np.array([]), np.array([])
+    X = sliding_window_view(data, time_step, axis=0)[:-1]
+    if data.ndim > 1:
+        X = np.moveaxis(X, -1, 1)  # (samples, features, time_step) -> (samples, time_step, features)
+    y = data[time_step:].view()
+    y.flags.writeable = False
+    return X, y
+
+@instrument()
 def create_supervised_data(data, time_step=1):
-    X, y = [], []
-    for i in range(len(data) - time_step):
-        X.append(data[i:(i + time_step)])  # Keep it as 1D
-        y.append(data[i + time_step])
-    return np.array(X), np.array(y)
+    """Windows of `time_step` rows and the next row as independent, writable arrays."""
+    X, y = sliding_windows(data, time_step)
+    return X.copy(), y.copy()
+
+def store_window_starts(store_ids, time_step=1):
+    """Start rows of the windows whose rows and target all belong to one store.
+
+    `store_ids` must be grouped (e.g. sorted by store and date), so a window is valid
+    exactly when its first row and its target row have the same store.
+    """
+    store_ids = np.asarray(store_ids)
+    if len(store_ids) <= time_step:
+        return np.array([], dtype=np.int64)
+    starts = np.arange(len(store_ids) - time_step)
+    return starts[store_ids[:-time_step] == store_ids[time_step:]]
+
+@instrument()
+def store_windows(data, time_step=1, feature_columns=('Sales', 'Customers', 'Promo'),
+                  target_column='Sales', store_column='Store', date_column='Date'):
+    """Zero-copy per-store windows over a Store/Date panel.
+
+    Sorts once by store and date and returns (values, X, y, starts, stores): `values` is the
+    (rows, features) array, X and y are sliding_windows views over all rows, `starts` indexes the
+    windows that do not cross a store boundary and `stores` holds the store of each of them.
+    """
+    data = data.sort_values([store_column, date_column], kind='stable')
+    values = np.ascontiguousarray(data[list(feature_columns)].to_numpy())
+    targets = data[target_column].to_numpy()
+    store_ids = data[store_column].to_numpy()
+
+    X, _ = sliding_windows(values, time_step)
+    starts = store_window_starts(store_ids, time_step)
+    return values, X, targets[time_step:], starts, store_ids[starts]
+
+@instrument()
+def create_store_supervised_data(data, time_step=1, feature_columns=('Sales', 'Customers', 'Promo'),
+                                 target_column='Sales', store_column='Store', date_column='Date'):
+    """Per-store (samples, time_step, features) windows and next-day targets, never crossing stores.
+
+    The valid windows are gathered from the zero-copy views in a single `take`.
+    """
+    _, X, y, starts, stores = store_windows(data, time_step, feature_columns, target_column,
+                                            store_column, date_column)
+    if len(starts) == 0:
+        return np.empty((0, time_step, len(feature_columns))), np.empty(0), stores
+    return X.take(starts, axis=0), y.take(starts), stores
 
 def build_lstm_model(input_shape):
     model = Sequential()
@@ -26,5 +90,54 @@ def build_lstm_model(input_shape):
     model.compile(optimizer='adam', loss='mean_absolute_error')
     return model
 
-def train_lstm_model(model, X_train, y_train, epochs=100, batch_size=32):
-    model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size)
\ No newline at end of file
+def split_stores(stores, validation_fraction=0.2, seed=42):
+    """Assign whole stores to training or validation; returns (train_mask, validation_mask) over `stores`."""
+    unique_stores = np.unique(stores)
+    n_validation = int(round(len(unique_stores) * validation_fraction))
+    rng = np.random.default_rng(seed)
+    validation_stores = rng.choice(unique_stores, size=n_validation, replace=False)
+    validation_mask = np.isin(stores, validation_stores)
+    return ~validation_mask, validation_mask
+
+def window_dataset(values, y, starts, time_step, batch_size=32, shuffle_buffer=10_000, shuffle=True, seed=None):
+    """tf.data pipeline that builds (batch, time_step, features) windows lazily from the raw series.
+
+    `values` is the (rows, features) series and `y[start]` the target of the window starting at
+    `start`, as returned by store_windows. Only window start indices are shuffled (within a bounded
+    buffer); windows are gathered per batch and prefetched, so memory stays proportional to the
+    raw series rather than to the number of windows.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if values.ndim == 1:
+        values = values[:, None]
+    values = tf.constant(values)
+    targets = tf.constant(np.asarray(y, dtype=np.float32))
+    offsets = tf.range(time_step, dtype=tf.int64)
+
+    def gather(batch_starts):
+        return tf.gather(values, batch_starts[:, None] + offsets), tf.gather(targets, batch_starts)
+
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(starts, dtype=np.int64))
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+@instrument()
+def store_window_datasets(data, time_step=1, feature_columns=('Sales', 'Customers', 'Promo'),
+                          target_column='Sales', validation_fraction=0.2, batch_size=32,
+                          shuffle_buffer=10_000, seed=42):
+    """Training and validation window datasets for a Store/Date panel, split by store."""
+    values, _, y, starts, stores = store_windows(data, time_step, feature_columns, target_column)
+    train_mask, validation_mask = split_stores(stores, validation_fraction, seed)
+    train_dataset = window_dataset(values, y, starts[train_mask], time_step, batch_size,
+                                   shuffle_buffer, seed=seed)
+    validation_dataset = window_dataset(values, y, starts[validation_mask], time_step, batch_size,
+                                        shuffle=False)
+    return train_dataset, validation_dataset
+
+@instrument()
+def train_lstm_model(model, X_train, y_train=None, epochs=100, batch_size=32, validation_data=None):
+    # A tf.data.Dataset (e.g. from window_dataset) is already batched and carries its targets
+    if isinstance(X_train, tf.data.Dataset):
+        return model.fit(X_train, epochs=epochs, validation_data=validation_data)
+    return model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_data=validation_data)
@@ -1,13 +1,220 @@
+import os
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+import joblib
+from joblib import Parallel, delayed
+from sklearn.base import clone
 from sklearn.metrics import mean_absolute_error
 
+import data_processing as dp
+
+logger = logging.getLogger(__name__)
+
 def evaluate_model(pipeline, X_test, y_test):
     y_pred = pipeline.predict(X_test)
     mae = mean_absolute_error(y_test, y_pred)
     return mae, y_pred
 
-def feature_importance(pipeline, feature_columns):
-    import pandas as pd
-    
+def rmspe(y_true, y_pred):
+    """Root mean squared percentage error over the rows with non-zero sales."""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    nonzero = y_true != 0
+    if not nonzero.any():
+        return np.nan
+    return float(np.sqrt(np.mean(((y_true[nonzero] - y_pred[nonzero]) / y_true[nonzero]) ** 2)))
+
+def rolling_origin_folds(dates, n_folds=3, horizon=42, gap=0, max_train_days=None):
+    """Date-based backtest folds over `dates` sorted ascending.
+
+    The last `n_folds` windows of `horizon` days are the test periods; each fold trains on the
+    days before its test period minus `gap` days (all of them, or the last `max_train_days`).
+    Returns dicts with row positions (train_start, train_end, test_start, test_end) into the
+    sorted rows and the matching dates.
+    """
+    days, valid = dp._to_day_numbers(dates)
+    if not valid.all():
+        raise ValueError(f"{(~valid).sum()} dates are missing or invalid; drop those rows before building folds.")
+    last_day = days[-1]
+    folds = []
+    for k in range(n_folds, 0, -1):
+        test_first = last_day - k * horizon + 1
+        train_last = test_first - gap - 1
+        train_first = days[0] if max_train_days is None else max(days[0], train_last - max_train_days + 1)
+        train_start, train_end, test_start, test_end = np.searchsorted(
+            days, [train_first, train_last + 1, test_first, test_first + horizon])
+        if train_end <= train_start:
+            raise ValueError(f"Fold with test period starting {pd.to_datetime(test_first, unit='D').date()} "
+                             "has no training data.")
+        folds.append({'fold': len(folds), 'train_start': train_start, 'train_end': train_end,
+                      'test_start': test_start, 'test_end': test_end,
+                      'train_from': pd.to_datetime(train_first, unit='D'),
+                      'test_from': pd.to_datetime(test_first, unit='D')})
+    return folds
+
+def featurize_for_backtest(data, feature_columns=None, fit_rows=None, cache_dir=None, **feature_kwargs):
+    """Feature matrix for backtesting, computed once for all folds and optionally cached on disk.
+
+    Features come from an unscaled data_processing.FeatureTransformer fitted on the first
+    `fit_rows` rows (the earliest training window, so no fold sees fill values from its test
+    period). With `cache_dir` the matrix is saved keyed by the data's content and reloaded
+    memory-mapped, so later backtests over the same data skip featurization and fold workers
+    share the file instead of copying it.
+    """
+    transformer = dp.FeatureTransformer(columns=feature_columns, scale=False, **feature_kwargs)
+    path = None
+    if cache_dir is not None:
+        key = joblib.hash((pd.util.hash_pandas_object(data, index=False).to_numpy(), fit_rows,
+                           transformer.get_params()))
+        path = os.path.join(cache_dir, f"backtest-features-{key}.joblib")
+        if os.path.exists(path):
+            logger.info("Loaded backtest features from %s", path)
+            return joblib.load(path, mmap_mode='r')
+
+    transformer.fit(data.iloc[:fit_rows] if fit_rows is not None else data)
+    X = transformer.transform(data)
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        joblib.dump(X, path)
+        logger.info("Cached backtest features at %s", path)
+    return X
+
+def _evaluate_fold(estimator, X, y, stores, fold):
+    train = slice(fold['train_start'], fold['train_end'])
+    test = slice(fold['test_start'], fold['test_end'])
+    start = time.perf_counter()
+    estimator.fit(X[train], y[train])
+    fit_time = time.perf_counter() - start
+    y_pred = estimator.predict(X[test])
+
+    fold_row = {key: fold[key] for key in ('fold', 'train_from', 'test_from')}
+    fold_row.update({'n_train': train.stop - train.start, 'n_test': test.stop - test.start,
+                     'mae': mean_absolute_error(y[test], y_pred), 'rmspe': rmspe(y[test], y_pred),
+                     'fit_s': fit_time})
+
+    results = pd.DataFrame({'Store': stores[test], 'y': y[test], 'y_pred': y_pred})
+    results['abs_error'] = (results['y'] - results['y_pred']).abs()
+    results['sq_pct_error'] = ((results['y'] - results['y_pred']) / results['y'].where(results['y'] != 0)) ** 2
+    store_rows = results.groupby('Store').agg(n=('y', 'size'), mae=('abs_error', 'mean'),
+                                              rmspe=('sq_pct_error', 'mean'))
+    store_rows['rmspe'] = np.sqrt(store_rows['rmspe'])
+    store_rows = store_rows.reset_index()
+    store_rows.insert(0, 'fold', fold['fold'])
+    return fold_row, store_rows
+
+def backtest(pipeline, data, feature_columns=None, target_column='Sales', n_folds=3, horizon=42, gap=0,
+             max_train_days=None, n_jobs=-1, cache_dir=None, **feature_kwargs):
+    """Rolling-origin backtest of a model pipeline on raw sales data.
+
+    `pipeline` is the model (e.g. model_training.build_model_pipeline() without a features step);
+    a fresh clone is trained per fold. Rows are sorted by date once, features are computed once
+    (see featurize_for_backtest) and every fold is a pair of row slices, evaluated on `n_jobs`
+    processes. Rows with a missing or invalid Date (load_data parses with errors='coerce') are
+    dropped with a warning. Returns (per-fold metrics, per-fold per-store metrics), both with MAE
+    and RMSPE.
+    """
+    invalid = data['Date'].isna()
+    if invalid.any():
+        logger.warning("Dropping %d rows with invalid dates from the backtest", invalid.sum())
+        data = data[~invalid]
+    data = data.sort_values('Date', kind='stable')
+    folds = rolling_origin_folds(data['Date'], n_folds, horizon, gap, max_train_days)
+    start = time.perf_counter()
+    X = featurize_for_backtest(data, feature_columns, folds[0]['train_end'], cache_dir, **feature_kwargs)
+    y = data[target_column].to_numpy(dtype=np.float64)
+    stores = data['Store'].to_numpy()
+    logger.info("Featurized %d rows for %d folds in %.3fs", len(X), len(folds), time.perf_counter() - start)
+
+    estimator = clone(pipeline)
+    workers = min(len(folds), joblib.effective_n_jobs(n_jobs))
+    if workers > 1:
+        # Split the cores between the concurrent folds to avoid oversubscription
+        threads = max(1, joblib.cpu_count() // workers)
+        estimator.set_params(**{name: threads for name in estimator.get_params() if name.endswith('n_jobs')})
+
+    start = time.perf_counter()
+    results = Parallel(n_jobs=workers)(delayed(_evaluate_fold)(clone(estimator), X, y, stores, fold)
+                                      for fold in folds)
+    logger.info("Evaluated %d folds in %.3fs", len(folds), time.perf_counter() - start)
+
+    fold_metrics = pd.DataFrame([fold_row for fold_row, _ in results])
+    store_metrics = pd.concat([store_rows for _, store_rows in results], ignore_index=True)
+    return fold_metrics, store_metrics
+
+# Features that only make sense permuted together
+FEATURE_GROUPS = {'MonthPart': ['BeginningOfMonth', 'MidMonth', 'EndOfMonth']}
+
+def _predict(estimator, X, feature_columns):
+    """Predict on the array, as a frame with the feature names if the estimator was fitted on one."""
+    if hasattr(estimator, 'feature_names_in_'):
+        X = pd.DataFrame(X, columns=feature_columns, copy=False)
+    return estimator.predict(X)
+
+def _permutation_scores(estimator, X, y, columns, feature_columns, n_repeats, seed):
+    rng = np.random.default_rng(seed)
+    X_permuted = X.copy()
+    scores = []
+    for _ in range(n_repeats):
+        # Rows of a group's columns are shuffled jointly, keeping the group internally consistent;
+        # only those columns are gathered
+        X_permuted[:, columns] = X[np.ix_(rng.permutation(len(X)), columns)]
+        scores.append(mean_absolute_error(y, _predict(estimator, X_permuted, feature_columns)))
+    return scores
+
+def permutation_importance(pipeline, X, y, feature_columns=None, groups=None, n_repeats=5, max_samples=20_000,
+                           n_jobs=-1, seed=42, base_predictions=None):
+    """MAE increase when a feature, or a group of features, is randomly permuted.
+
+    A pipeline with a features step featurizes X once and only the model is re-run. Scoring uses
+    at most `max_samples` rows drawn from the held-out X (pass the same `seed` and the returned
+    base predictions as `base_predictions` to skip the base pass on later calls). `groups` maps a
+    name to columns permuted together (e.g. FEATURE_GROUPS); other columns are permuted alone.
+    Groups run on `n_jobs` threads. Returns (importance frame, base predictions of the sample).
+    """
+    estimator = pipeline
+    if hasattr(pipeline, 'steps') and len(pipeline.steps) > 1:
+        X = pipeline[:-1].transform(X)
+        estimator = pipeline.steps[-1][1]
+        feature_columns = feature_columns or list(pipeline[:-1].get_feature_names_out())
+    elif feature_columns is None:
+        feature_columns = list(getattr(estimator, 'feature_names_in_', X.columns))
+    X = X[feature_columns].to_numpy(dtype=np.float64) if isinstance(X, pd.DataFrame) else np.asarray(X, np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    if len(X) > max_samples:
+        sample = np.sort(np.random.default_rng(seed).choice(len(X), max_samples, replace=False))
+        X, y = X[sample], y[sample]
+    if base_predictions is None:
+        base_predictions = _predict(estimator, X, feature_columns)
+    base_score = mean_absolute_error(y, base_predictions)
+
+    grouped = set(column for columns in (groups or {}).values() for column in columns)
+    permutations = {name: [feature_columns.index(column) for column in columns]
+                    for name, columns in (groups or {}).items()}
+    permutations.update({column: [j] for j, column in enumerate(feature_columns) if column not in grouped})
+
+    start = time.perf_counter()
+    scores = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(_permutation_scores)(estimator, X, y, columns, feature_columns, n_repeats, seed + i)
+        for i, columns in enumerate(permutations.values()))
+    logger.info("Permutation importance of %d features/groups on %d rows in %.3fs", len(permutations),
+                len(X), time.perf_counter() - start)
+
+    increases = np.asarray(scores) - base_score
+    importance_df = pd.DataFrame({'Feature': list(permutations), 'Importance': increases.mean(axis=1),
+                                  'Std': increases.std(axis=1)})
+    return importance_df.sort_values(by='Importance', ascending=False), base_predictions
+
+def feature_importance(pipeline, feature_columns, method='impurity', X=None, y=None, **permutation_kwargs):
+    """Impurity-based importances of the model, or permutation importances on held-out X and y."""
+    if method == 'permutation':
+        return permutation_importance(pipeline, X, y, feature_columns, **permutation_kwargs)[0]
+    if method != 'impurity':
+        raise ValueError(f"Unknown importance method: {method}")
+
     importances = pipeline.named_steps['model'].feature_importances_
     importance_df = pd.DataFrame({'Feature': feature_columns, 'Importance': importances})
-    return importance_df.sort_values(by='Importance', ascending=False)
\ No newline at end of file
+    return importance_df.sort_values(by='Importance', ascending=False)
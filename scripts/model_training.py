@@ -1,17 +1,101 @@
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 import joblib
 import datetime
+import os
+import logging
+import time
 
-def build_model_pipeline():
-    return Pipeline([
-        ('model', RandomForestRegressor(n_estimators=100))
-    ])
+from instrumentation import instrument
 
-def train_model(pipeline, X_train, y_train):
-    pipeline.fit(X_train, y_train)
+logger = logging.getLogger(__name__)
+
+def build_model_pipeline(backend='random_forest', n_estimators=100, n_jobs=-1, warm_start=False, features=None,
+                         **model_params):
+    """Build the model pipeline.
+
+    'random_forest' trains its trees on `n_jobs` cores (-1 uses all of them) and, with `warm_start`,
+    can later be grown with update_model. 'hist_gradient_boosting' bins features into histograms,
+    which scales better to large row counts; `n_estimators` is its number of boosting iterations.
+    A `features` transformer (e.g. data_processing.FeatureTransformer) becomes the first step, so
+    the pipeline takes raw frames and its fitted state is saved with the model.
+    """
+    if backend == 'random_forest':
+        model = RandomForestRegressor(n_estimators=n_estimators, n_jobs=n_jobs, warm_start=warm_start,
+                                      **model_params)
+    elif backend == 'hist_gradient_boosting':
+        model = HistGradientBoostingRegressor(max_iter=n_estimators, warm_start=warm_start, **model_params)
+    else:
+        raise ValueError(f"Unknown model backend: {backend}")
+    steps = [('model', model)]
+    if features is not None:
+        steps.insert(0, ('features', features))
+    return Pipeline(steps)
+
+def _fit_final_step(pipeline, X, y, timings):
+    """Run the fitted preprocessing steps, then fit only the final estimator."""
+    for name, step in pipeline.steps[:-1]:
+        start = time.perf_counter()
+        X = step.transform(X)
+        timings[name] = time.perf_counter() - start
+    name, model = pipeline.steps[-1]
+    start = time.perf_counter()
+    model.fit(X, y)
+    timings[name] = time.perf_counter() - start
+
+def _log_timings(action, timings):
+    for stage, seconds in timings.items():
+        logger.info("%s stage %s took %.3fs", action, stage, seconds)
+    logger.info("%s completed in %.3fs", action, sum(timings.values()))
+
+@instrument()
+def train_model(pipeline, X_train, y_train, timings=None):
+    """Fit the pipeline step by step, logging (and filling `timings` with) each stage's wall time."""
+    timings = {} if timings is None else timings
+    X = X_train
+    for name, step in pipeline.steps[:-1]:
+        start = time.perf_counter()
+        X = step.fit_transform(X, y_train)
+        timings[name] = time.perf_counter() - start
+    name, model = pipeline.steps[-1]
+    start = time.perf_counter()
+    model.fit(X, y_train)
+    timings[name] = time.perf_counter() - start
+
+    _log_timings("Training", timings)
+    return pipeline
+
+@instrument()
+def update_model(pipeline, X_new, y_new, n_new_estimators=20, timings=None):
+    """Grow a trained model on newly arrived data instead of retraining from scratch.
+
+    A random forest keeps its trees and adds `n_new_estimators` trees fitted on the new rows; a
+    histogram gradient-boosting model adds that many boosting iterations. Preprocessing steps keep
+    their fitted state so the existing trees still see consistently transformed features.
+    """
+    timings = {} if timings is None else timings
+    model = pipeline.steps[-1][1]
+    if isinstance(model, RandomForestRegressor):
+        size_param, size = 'n_estimators', len(model.estimators_)
+    elif isinstance(model, HistGradientBoostingRegressor):
+        size_param, size = 'max_iter', model.n_iter_
+    else:
+        raise ValueError(f"Incremental updates are not supported for {type(model).__name__}")
+
+    # Warm-start only for this fit, so a later train_model call is a full retrain again
+    original = model.get_params()
+    model.set_params(warm_start=True, **{size_param: size + n_new_estimators})
+    try:
+        _fit_final_step(pipeline, X_new, y_new, timings)
+    finally:
+        model.set_params(warm_start=original['warm_start'], **{size_param: original[size_param]})
+    _log_timings("Incremental update", timings)
     return pipeline
 
-def save_model(model):
+@instrument()
+def save_model(model, model_dir='.'):
     timestamp = datetime.datetime.now().strftime("%d-%m-%Y-%H-%M-%S")
-    joblib.dump(model, f'model_{timestamp}.pkl')
\ No newline at end of file
+    path = os.path.join(model_dir, f'model_{timestamp}.pkl')
+    # Saved uncompressed so the model's arrays can be memory-mapped on load
+    joblib.dump(model, path)
+    return path
@@ -0,0 +1,131 @@
+import os
+import glob
+import time
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+import joblib
+
+import data_processing as dp
+
+logger = logging.getLogger(__name__)
+
+def latest_model_path(model_dir='.'):
+    """Return the most recently written model saved by model_training.save_model."""
+    paths = glob.glob(os.path.join(model_dir, 'model_*.pkl'))
+    if not paths:
+        raise FileNotFoundError(f"No saved model found in {model_dir}")
+    return max(paths, key=os.path.getmtime)
+
+
+class PredictionService:
+    """Serve sales predictions from one loaded model.
+
+    The model is loaded once, with its NumPy arrays memory-mapped, and reused for every call.
+    If it was trained with a FeatureTransformer step, request frames go straight to it;
+    otherwise they go through the data_processing stages without scaling, which only matches
+    models trained on unscaled features (a warning is logged on load).
+    predict_batch featurizes many request frames (any mix of stores and dates) in one pass and
+    runs the model on at most `batch_size` rows at a time. Per-request latencies are kept for
+    latency_report.
+    """
+
+    def __init__(self, model_path=None, model_dir='.', feature_columns=None, batch_size=4096, **feature_kwargs):
+        self.model_path = model_path or latest_model_path(model_dir)
+        start = time.perf_counter()
+        self.model = joblib.load(self.model_path, mmap_mode='r')
+        logger.info("Loaded model %s in %.3fs", self.model_path, time.perf_counter() - start)
+
+        self.feature_columns = list(feature_columns or dp.FEATURE_COLUMNS)
+        self.has_features = 'features' in getattr(self.model, 'named_steps', {})
+        if not self.has_features:
+            logger.warning("Model %s has no fitted features step; requests are featurized without scaling, "
+                           "so predictions are only valid if it was trained on unscaled features", self.model_path)
+        self.batch_size = batch_size
+        self.feature_kwargs = feature_kwargs
+        self.latencies = []
+        self.rows = 0
+        self.busy_time = 0.0
+
+    def features(self, requests):
+        """Model input frame for a list of request frames, computed in one pass.
+
+        Each frame needs the test.csv columns (Store, Date, Open, Promo, StateHoliday,
+        SchoolHoliday). Without a fitted features step, missing values are forward-filled
+        within each request only.
+        """
+        data = pd.concat(requests, keys=range(len(requests)), names=['request', None], copy=False)
+        if not pd.api.types.is_datetime64_any_dtype(data['Date']):
+            data['Date'] = pd.to_datetime(data['Date'])
+        if self.has_features:
+            return data
+        data = dp.extract_features(data, **self.feature_kwargs)
+        data = data.groupby(level='request', sort=False).ffill()
+        data = dp.convert_categorical(data, dp.DUMMY_LEVELS)
+        return data[self.feature_columns]
+
+    def predict_batch(self, requests):
+        """Predict every request frame in `requests`; returns one array of predictions per frame."""
+        start = time.perf_counter()
+        X = self.features(requests)
+        predictions = np.empty(len(X))
+        for begin in range(0, len(X), self.batch_size):
+            predictions[begin:begin + self.batch_size] = self.model.predict(X.iloc[begin:begin + self.batch_size])
+        elapsed = time.perf_counter() - start
+
+        # Requests served together share the batch's latency
+        self.latencies.extend([elapsed] * len(requests))
+        self.rows += len(X)
+        self.busy_time += elapsed
+        return np.split(predictions, np.cumsum([len(request) for request in requests])[:-1])
+
+    def predict(self, request):
+        """Predict a single request frame."""
+        return self.predict_batch([request])[0]
+
+    def latency_report(self):
+        """p50/p99 request latency in milliseconds and throughput in rows per second so far."""
+        latencies = np.asarray(self.latencies) * 1000
+        report = {
+            'requests': len(latencies),
+            'rows': self.rows,
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else float('nan'),
+            'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else float('nan'),
+            'throughput_rows_per_s': self.rows / self.busy_time if self.busy_time else float('nan'),
+        }
+        logger.info("Served %d requests (%d rows): p50 %.2fms, p99 %.2fms, %.0f rows/s", report['requests'],
+                    report['rows'], report['p50_ms'], report['p99_ms'], report['throughput_rows_per_s'])
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Predict sales for a test.csv-style file with the latest model.")
+    parser.add_argument('input', help="Path to the request CSV (test.csv columns)")
+    parser.add_argument('--model', help="Model file (default: latest model_*.pkl in --model-dir)")
+    parser.add_argument('--model-dir', default='.')
+    parser.add_argument('--output', default='predictions.csv')
+    parser.add_argument('--batch-size', type=int, default=4096, help="Rows per model call")
+    parser.add_argument('--requests-per-batch', type=int, default=64,
+                        help="Per-store requests featurized and predicted together")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    service = PredictionService(args.model, args.model_dir, batch_size=args.batch_size)
+    data = dp.load_data(args.input)
+
+    # One request per store, served in micro-batches
+    requests = [request for _, request in data.groupby('Store', sort=False)]
+    predictions = []
+    for begin in range(0, len(requests), args.requests_per_batch):
+        predictions.extend(service.predict_batch(requests[begin:begin + args.requests_per_batch]))
+
+    output = pd.concat(requests)[['Id']] if 'Id' in data.columns else pd.concat(requests)[['Store', 'Date']]
+    output['Sales'] = np.concatenate(predictions)
+    output.sort_index().to_csv(args.output, index=False)
+    service.latency_report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.stattools import adfuller
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_store_time_series(data, columns=('Sales',), store_column='Store', date_column='Date'):
+    """Daily per-store series for every store in one vectorized pass.
+
+    Per store this matches lstm_model.prepare_time_series: rows are summed per day and the days
+    between the store's first and last date that have no rows are filled with 0. Returns a frame
+    indexed by (Store, Date).
+    """
+    columns = list(columns)
+    daily = data.groupby([store_column, data[date_column].dt.floor('D')])[columns].sum()
+
+    # Full daily range of each store, built without a per-store loop
+    stores = daily.index.get_level_values(0)
+    days = daily.index.get_level_values(1).values.astype('datetime64[D]').astype(np.int64)
+    bounds = pd.DataFrame({'store': stores, 'day': days}).groupby('store', sort=True)['day'].agg(['min', 'max'])
+    lengths = (bounds['max'] - bounds['min'] + 1).to_numpy()
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    full_days = np.repeat(bounds['min'].to_numpy(), lengths) + offsets
+
+    full_index = pd.MultiIndex.from_arrays(
+        [np.repeat(bounds.index.to_numpy(), lengths), pd.to_datetime(full_days, unit='D')],
+        names=[store_column, date_column])
+    return daily.reindex(full_index, fill_value=0)
+
+
+def fit_exponential_smoothing(series, horizon=42, seasonal_periods=7):
+    """Default per-store model: additive weekly Holt-Winters; returns scalar fit results."""
+    model = ExponentialSmoothing(series, trend='add', seasonal='add',
+                                 seasonal_periods=seasonal_periods).fit()
+    return {'aic': model.aic, 'forecast_mean': float(np.mean(model.forecast(horizon)))}
+
+
+def _analyze_store_chunk(chunk, fit_func, significance):
+    """Run the ADF test and `fit_func` for a chunk of (store, values) pairs in one worker."""
+    rows = []
+    for store, values in chunk:
+        row = {'Store': store, 'n_obs': len(values)}
+        try:
+            adf_statistic, p_value = adfuller(values)[:2]
+            row.update({'adf_statistic': adf_statistic, 'p_value': p_value,
+                        'is_stationary': p_value < significance})
+            if fit_func is not None:
+                row.update(fit_func(values))
+        except Exception as e:  # e.g. constant or too short series
+            row['error'] = str(e)
+        rows.append(row)
+    return rows
+
+
+def analyze_stores(store_series, column='Sales', fit_func=fit_exponential_smoothing, significance=0.05,
+                   n_jobs=None, chunksize=32):
+    """ADF test (p-value < `significance` means stationary) and model fit for every store, in parallel.
+
+    `store_series` is the output of prepare_store_time_series. Stores are sent to a process pool in
+    chunks of `chunksize` to amortize the inter-process overhead; `fit_func` must be a picklable
+    function taking a 1-D array and returning a dict of scalars (None skips fitting). Returns one
+    row per store.
+    """
+    grouped = store_series[column].groupby(level=0, sort=True)
+    items = [(store, series.to_numpy()) for store, series in grouped]
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    n_jobs = n_jobs or os.cpu_count()
+    logger.info("Analyzing %d stores in %d chunks on %d processes...", len(items), len(chunks), n_jobs)
+
+    if n_jobs == 1:
+        results = [_analyze_store_chunk(chunk, fit_func, significance) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_analyze_store_chunk, chunks, [fit_func] * len(chunks),
+                                    [significance] * len(chunks)))
+
+    logger.info("Store analysis completed.")
+    return pd.DataFrame([row for rows in results for row in rows])
@@ -0,0 +1,24 @@
+import benchmarks
+import instrumentation as ins
+
+
+def test_suite_covers_the_pipeline_entry_points():
+    cases = benchmarks.suite_cases()
+    for name in ['model_evaluation.backtest', 'store_forecasting.analyze_stores', 'model_training.update_model',
+                 'data_processing.iter_data', 'data_processing.stream_features',
+                 'data_cache.cached_load_data[miss]', 'data_cache.cached_features[hit]']:
+        assert name in cases
+
+
+def test_run_suite_restores_the_instrumentation_settings(tmp_path):
+    previous = dict(ins._settings)
+    ins.configure(trace_file=str(tmp_path / 'trace.jsonl'))
+    try:
+        results = benchmarks.run_suite([1_000], ['data_processing.extract_features', 'data_processing.iter_data'],
+                                       repeat=1)
+        assert ins._settings == {'enabled': True, 'trace_file': str(tmp_path / 'trace.jsonl')}
+    finally:
+        ins._settings.update(previous)
+    assert set(results['1k']) == {'data_processing.extract_features', 'data_processing.iter_data'}
+    # Stages run inside the suite are not traced
+    assert not (tmp_path / 'trace.jsonl').exists()
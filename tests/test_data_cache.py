@@ -0,0 +1,115 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pytest
+
+import data_cache as dc
+
+
+def _write_sales(path, n_days=30, offset=0):
+    dates = pd.date_range('2013-01-01', periods=n_days, freq='D')
+    pd.DataFrame({
+        'Store': 1, 'DayOfWeek': dates.dayofweek + 1, 'Date': dates.strftime('%Y-%m-%d'),
+        'Sales': range(offset, offset + n_days), 'Customers': 10, 'Open': 1, 'Promo': 0,
+        'StateHoliday': '0', 'SchoolHoliday': 0,
+    }).to_csv(path, index=False)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / 'cache')
+
+
+def _entries(cache_dir):
+    return sorted(glob.glob(os.path.join(cache_dir, '*.feather')))
+
+
+def test_same_basename_in_different_directories_do_not_evict_each_other(tmp_path, cache_dir):
+    for version in ('v1', 'v2'):
+        os.makedirs(tmp_path / version)
+    _write_sales(tmp_path / 'v1' / 'train.csv', offset=0)
+    _write_sales(tmp_path / 'v2' / 'train.csv', offset=1000)
+
+    first = dc.cached_load_data(str(tmp_path / 'v1' / 'train.csv'), cache_dir)
+    second = dc.cached_load_data(str(tmp_path / 'v2' / 'train.csv'), cache_dir)
+    entries = _entries(cache_dir)
+    assert len(entries) == 2
+
+    # Both entries are reused rather than rebuilt
+    pd.testing.assert_frame_equal(dc.cached_load_data(str(tmp_path / 'v1' / 'train.csv'), cache_dir), first)
+    pd.testing.assert_frame_equal(dc.cached_load_data(str(tmp_path / 'v2' / 'train.csv'), cache_dir), second)
+    assert _entries(cache_dir) == entries
+
+
+def test_feature_params_get_separate_entries(tmp_path, cache_dir):
+    path = str(tmp_path / 'train.csv')
+    _write_sales(path)
+    christmas = dc.cached_features(path, cache_dir, holidays=pd.to_datetime(['2013-01-10']))
+    new_year = dc.cached_features(path, cache_dir, holidays=pd.to_datetime(['2013-01-20']))
+    assert not christmas['DaysToHoliday'].equals(new_year['DaysToHoliday'])
+
+    features_entries = [entry for entry in _entries(cache_dir) if '-features-' in entry]
+    assert len(features_entries) == 2
+
+
+def test_changed_source_replaces_its_stale_entry(tmp_path, cache_dir):
+    path = str(tmp_path / 'train.csv')
+    _write_sales(path, offset=0)
+    dc.cached_load_data(path, cache_dir)
+    _write_sales(path, offset=5)
+    reloaded = dc.cached_load_data(path, cache_dir)
+
+    assert reloaded['Sales'].iloc[0] == 5
+    assert len(_entries(cache_dir)) == 1
+
+
+def test_entries_are_memory_mapped_without_decompression(tmp_path, cache_dir):
+    path = str(tmp_path / 'train.csv')
+    _write_sales(path)
+    dc.cached_load_data(path, cache_dir)
+
+    # A compressed file would have to be decompressed into newly allocated buffers
+    allocated = pa.total_allocated_bytes()
+    table = feather.read_table(_entries(cache_dir)[0], memory_map=True)
+    assert table.num_rows == 30
+    assert pa.total_allocated_bytes() == allocated
+
+
+def test_concurrent_misses_of_one_entry_write_separate_temporary_files(tmp_path, cache_dir, monkeypatch):
+    path = str(tmp_path / 'train.csv')
+    _write_sales(path)
+    written = []
+    to_feather = pd.DataFrame.to_feather
+
+    def recording_to_feather(frame, target, **kwargs):
+        written.append(target)
+        return to_feather(frame, target, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, 'to_feather', recording_to_feather)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: dc.cached_load_data(path, cache_dir), range(4)))
+
+    assert len(set(written)) == len(written)
+    for result in results[1:]:
+        pd.testing.assert_frame_equal(result, results[0])
+    assert len(_entries(cache_dir)) == 1
+    assert not glob.glob(os.path.join(cache_dir, '*.tmp'))
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, cache_dir, monkeypatch):
+    path = str(tmp_path / 'train.csv')
+    _write_sales(path)
+
+    def failing_to_feather(frame, target, **kwargs):
+        with open(target, 'wb') as f:
+            f.write(b'partial')
+        raise OSError('disk full')
+
+    monkeypatch.setattr(pd.DataFrame, 'to_feather', failing_to_feather)
+    with pytest.raises(OSError):
+        dc.cached_load_data(path, cache_dir)
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+import benchmarks
+import data_processing as dp
+import lag_features as lf
+
+HOLIDAYS = pd.to_datetime(['2013-01-01', '2013-02-14', '2013-04-01'])
+
+
+@pytest.fixture
+def sales():
+    return benchmarks.make_synthetic_sales(n_stores=4, n_days=60, seed=0)
+
+
+def test_holiday_distances_match_the_legacy_loop(sales):
+    # Unsorted holidays, and dates before the first and after the last holiday
+    holidays = pd.to_datetime(['2013-02-20', '2012-12-25', '2013-01-10', '2013-01-11'])
+    sales.loc[sales.index[::7], 'Date'] = pd.NaT
+    expected_to, expected_after = benchmarks._legacy_holiday_features(sales[sales['Date'].notna()], holidays)
+
+    features = dp.add_holiday_features(sales.copy(), holidays)
+    valid = sales['Date'].notna()
+    np.testing.assert_array_equal(features.loc[valid, 'DaysToHoliday'], expected_to)
+    np.testing.assert_array_equal(features.loc[valid, 'DaysAfterHoliday'], expected_after)
+
+
+def _featurize(data):
+    data = dp.extract_features(data, holidays=HOLIDAYS)
+    return dp.convert_categorical(dp.handle_missing_values(data))
+
+
+def test_streamed_features_match_the_eager_pipeline_across_chunk_gaps(sales, tmp_path):
+    chunksize = 50
+    # A test.csv-shaped file; Open is the column with missing values there
+    test = sales.drop(columns=['Sales', 'Customers'])
+    test.insert(0, 'Id', np.arange(1, len(test) + 1))
+    # Gaps starting a chunk, spanning a whole chunk and ending right before a boundary
+    test.loc[[chunksize, chunksize + 1], 'Open'] = np.nan
+    test.loc[2 * chunksize:3 * chunksize + 5, 'Open'] = np.nan
+    test.loc[4 * chunksize - 3:4 * chunksize - 1, 'StateHoliday'] = np.nan
+    path = tmp_path / 'test.csv'
+    test.to_csv(path, index=False)
+
+    eager = _featurize(dp.load_data(path))
+    streamed = pd.concat(dp.stream_features(dp.iter_data(path, chunksize=chunksize), holidays=HOLIDAYS))
+    assert not streamed['Open'].isna().any()
+    pd.testing.assert_frame_equal(streamed, eager)
+
+
+def test_streamed_and_eager_features_have_the_same_dummy_columns_for_a_single_level(sales, tmp_path):
+    sales['SchoolHoliday'] = 0
+    path = tmp_path / 'train.csv'
+    sales.to_csv(path, index=False)
+
+    eager = _featurize(dp.load_data(path))
+    streamed = pd.concat(dp.stream_features(dp.iter_data(path, chunksize=50), holidays=HOLIDAYS))
+    assert 'SchoolHoliday_1' in eager.columns
+    pd.testing.assert_frame_equal(streamed, eager)
+
+
+def test_incremental_update_matches_a_full_recompute(sales):
+    # Store 2 misses ten days, store 3 one of the new days and store 4 the week before them
+    day = (sales['Date'] - sales['Date'].min()).dt.days
+    gaps = (((sales['Store'] == 2) & day.between(40, 49)) | ((sales['Store'] == 3) & (day == 58))
+            | ((sales['Store'] == 4) & day.between(50, 56)))
+    sales = dp.apply_schema(sales[~gaps].sort_values(['Date', 'Store'], ignore_index=True))
+    sales.loc[sales['Date'] == sales['Date'].max(), 'Open'] = np.nan
+    params = {'lags': (1, 7), 'windows': (7,), 'ewm_spans': ()}
+    store_features = lf.lag_feature_func(**params)
+    full = store_features(_featurize(sales.copy()))
+
+    # Featurize the last three days one day at a time
+    new_days = sales['Date'] >= sales['Date'].max() - pd.Timedelta(days=2)
+    history = store_features(_featurize(sales[~new_days].copy()))
+    state = dp.feature_state(history, lf.required_history(**params), holidays=HOLIDAYS)
+    updates = []
+    for _, day in sales[new_days].groupby('Date'):
+        update, state = dp.update_features(day.copy(), state, store_features)
+        updates.append(update)
+
+    incremental = pd.concat(updates)
+    pd.testing.assert_frame_equal(incremental, full.loc[incremental.index, incremental.columns],
+                                  check_dtype=False)
+
+
+def test_feature_transformer_matches_the_feature_stages(sales):
+    sales = dp.apply_schema(sales)
+    expected = StandardScaler().fit_transform(_featurize(sales.copy())[dp.FEATURE_COLUMNS])
+
+    transformer = dp.FeatureTransformer(holidays=HOLIDAYS).fit(sales)
+    np.testing.assert_allclose(transformer.transform(sales), expected)
+    assert list(transformer.get_feature_names_out()) == dp.FEATURE_COLUMNS
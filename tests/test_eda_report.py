@@ -0,0 +1,55 @@
+import json
+
+import pandas as pd
+
+import eda_report
+import eda_script_1 as eda
+import instrumentation as ins
+
+
+def _sales(stores, sales):
+    return pd.DataFrame({'Store': stores, 'Date': '2015-07-31', 'Sales': sales, 'Customers': 1, 'Open': 1,
+                         'Promo': 0, 'StateHoliday': '0', 'SchoolHoliday': 0})
+
+
+def test_shared_cache_keeps_enriched_frames_of_different_datasets_apart():
+    store = pd.DataFrame({'Store': [1, 2], 'StoreType': ['a', 'b'], 'Assortment': ['a', 'c']})
+    cache = eda.AggregateCache()
+
+    first = eda_report.run_analyses(_sales([1, 2], [100, 200]), store, analyses=['assortment_sales'],
+                                    cache=cache)[0]['assortment_sales'][1]
+    second = eda_report.run_analyses(_sales([1, 2], [300, 400]), store, analyses=['assortment_sales'],
+                                     cache=cache)[0]['assortment_sales'][1]
+
+    assert first.set_index('Assortment')['Sales'].to_dict() == {'a': 100, 'c': 200}
+    assert second.set_index('Assortment')['Sales'].to_dict() == {'a': 300, 'c': 400}
+
+
+def test_same_sales_with_another_store_frame_is_enriched_again():
+    train = _sales([1, 2], [100, 200])
+    cache = eda.AggregateCache()
+
+    first = eda_report._enriched({'train': train, 'store': pd.DataFrame({'Store': [1, 2], 'Assortment': ['a', 'c']})},
+                                 cache)
+    second = eda_report._enriched({'train': train, 'store': pd.DataFrame({'Store': [1, 2], 'Assortment': ['b', 'b']})},
+                                  cache)
+
+    assert list(first['Assortment']) == ['a', 'c']
+    assert list(second['Assortment']) == ['b', 'b']
+
+
+def test_configured_instrumentation_records_the_eda_analyses(tmp_path):
+    store = pd.DataFrame({'Store': [1, 2], 'StoreType': ['a', 'b'], 'Assortment': ['a', 'c']})
+    trace_file = tmp_path / 'trace.jsonl'
+    previous = dict(ins._settings)
+    ins.configure(trace_file=str(trace_file))
+    try:
+        eda_report.run_analyses(_sales([1, 2], [100, 200]), store, analyses=['assortment_sales'])
+        eda.enrich_sales(_sales([1, 2], [100, 200]), store)
+    finally:
+        ins._settings.update(previous)
+
+    stages = [json.loads(line)['stage'] for line in trace_file.read_text().splitlines()]
+    assert 'eda_report.analysis.assortment_sales' in stages
+    assert 'eda_report.run_analyses' in stages
+    assert 'eda_script_1.enrich_sales' in stages
@@ -0,0 +1,92 @@
+import warnings
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmarks
+import eda_script_1 as eda
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+
+def _legacy_holiday_status(df):
+    """Per-holiday loop that holiday_analysis used before label_holiday_status."""
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date'])
+    holiday_dates = df[df['StateHoliday'] != '0']['Date'].unique()
+    df['Holiday_Status'] = 'Before'
+    for holiday in holiday_dates:
+        holiday = pd.to_datetime(holiday)
+        df.loc[df['Date'] == holiday, 'Holiday_Status'] = 'During'
+        df.loc[df['Date'] == holiday + pd.Timedelta(days=1), 'Holiday_Status'] = 'After'
+        df.loc[df['Date'] == holiday - pd.Timedelta(days=1), 'Holiday_Status'] = 'Before'
+    return df['Holiday_Status']
+
+
+@pytest.fixture
+def sales():
+    data = benchmarks.make_synthetic_sales(n_stores=5, n_days=120, seed=0)
+    data['StateHoliday'] = '0'
+    # Isolated holidays, back-to-back holidays and holidays two days apart, listed out of date order
+    for day in ['2013-03-10', '2013-01-05', '2013-01-06', '2013-02-01', '2013-02-03', '2013-04-30']:
+        data.loc[data['Date'] == day, 'StateHoliday'] = 'a'
+    return data.sample(frac=1, random_state=0)
+
+
+def test_holiday_labels_match_the_legacy_loop(sales):
+    labels = eda.label_holiday_status(sales)
+    pd.testing.assert_series_equal(labels, _legacy_holiday_status(sales), check_dtype=False)
+
+
+def test_new_competitor_comparison_matches_the_legacy_loop(sales):
+    rng = np.random.default_rng(0)
+    sales = sales.sort_values(['Store', 'Date'])
+    sales['CompetitionDistance'] = np.repeat(rng.uniform(20, 20000, 5), 120)
+    # Store 1 always has a distance, stores 2, 3 and 5 get one later, store 4 never does
+    day = sales.groupby('Store').cumcount()
+    update_day = sales['Store'].map({1: 0, 2: 30, 3: 119, 4: 120, 5: 1})
+    sales.loc[day < update_day, 'CompetitionDistance'] = np.nan
+
+    expected = benchmarks._legacy_new_competitors_comparison(sales)
+    comparison = eda.new_competitors_sales_comparison(sales)
+    assert sorted(comparison['Store'].unique()) == [2, 3, 5]
+    pd.testing.assert_frame_equal(comparison, expected)
+
+
+def test_enrich_sales_matches_a_merge_without_warnings(sales):
+    stores = benchmarks.make_synthetic_stores(5, seed=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        enriched = eda.enrich_sales(sales, stores)
+    expected = sales.merge(stores, on='Store', how='left')
+    pd.testing.assert_frame_equal(enriched.reset_index(drop=True), expected)
+
+
+@pytest.fixture
+def customers():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'Customers': rng.integers(0, 2500, 5_000), 'Sales': rng.integers(0, 20000, 5_000)})
+
+
+def test_binned_scatter_is_drawn_on_its_own_grid(customers):
+    table = eda.scatter_table(customers, 'Customers', 'Sales', max_points=1_000, mode='binned', gridsize=20)
+    assert table['points']['Count'].sum() == len(customers)
+
+    eda.render_scatter(table, 'Customers', 'Sales', 'title', 'x', 'y')
+    mesh = plt.gca().collections[0]
+    expected, _, _ = np.histogram2d(customers['Customers'], customers['Sales'], bins=20)
+    np.testing.assert_array_equal(mesh.get_array().filled(0).reshape(20, 20), expected.T)
+    plt.close('all')
+
+
+def test_sampled_scatter_keeps_at_most_max_points(customers):
+    table = eda.scatter_table(customers, 'Customers', 'Sales', max_points=1_000)
+    assert not table['binned'] and len(table['points']) == 1_000
+
+
+def test_unknown_scatter_mode_is_rejected(customers):
+    with pytest.raises(ValueError, match='Unknown scatter mode'):
+        eda.scatter_table(customers, 'Customers', 'Sales', max_points=1_000, mode='hex')
@@ -0,0 +1,44 @@
+import os
+import json
+import logging
+import subprocess
+import sys
+
+import pytest
+
+import instrumentation as ins
+
+
+@pytest.fixture
+def restore_settings():
+    previous = dict(ins._settings)
+    yield
+    ins._settings.update(previous)
+
+
+@ins.instrument(name='double')
+def _double(values):
+    return values * 2
+
+
+def test_instrumentation_is_off_until_configured(caplog):
+    with caplog.at_level(logging.INFO, logger='instrumentation'):
+        _double(3)
+    assert not caplog.records
+
+
+def test_configure_records_stages_to_the_trace_file(tmp_path, restore_settings):
+    trace_file = tmp_path / 'trace.jsonl'
+    ins.configure(trace_file=str(trace_file))
+    _double(3)
+
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [record['stage'] for record in records] == ['double']
+
+
+def test_importing_the_pipeline_modules_leaves_logging_unconfigured():
+    code = ("import logging, benchmarks, data_cache, eda_report, model_evaluation, model_training, "
+            "prediction_service, store_forecasting; print(len(logging.getLogger().handlers))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(ins.__file__))
+    assert result.stdout.strip() == '0'
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmarks
+import lag_features as lf
+
+
+@pytest.fixture
+def sales():
+    data = benchmarks.make_synthetic_sales(n_stores=3, n_days=60, seed=0)
+    # Store 2 has no rows for ten days
+    gap = (data['Store'] == 2) & data['Date'].between('2013-01-21', '2013-01-30')
+    return data[~gap].sample(frac=1, random_state=0)
+
+
+def _naive(data, lag=None, window=None, stat='mean'):
+    """Per-store reference over a daily reindex of each store."""
+    out = pd.Series(np.nan, index=data.index)
+    for _, group in data.groupby('Store'):
+        daily = group.set_index('Date')['Sales'].astype(float).asfreq('D')
+        if lag is not None:
+            values = daily.shift(lag)
+        else:
+            values = getattr(daily.shift(1).rolling(window, min_periods=1), stat)()
+        out[group.index] = values.reindex(group['Date']).to_numpy()
+    return out
+
+
+def test_lags_and_windows_count_calendar_days_across_gaps(sales):
+    features = lf.add_lag_features(sales.copy(), lags=(1, 7), windows=(7, 28), ewm_spans=())
+    for lag in (1, 7):
+        np.testing.assert_allclose(features[f'SalesLag{lag}'], _naive(sales, lag=lag), equal_nan=True)
+    for window in (7, 28):
+        for stat in lf.ROLLING_STATS:
+            np.testing.assert_allclose(features[f'SalesRoll{stat.capitalize()}{window}'],
+                                       _naive(sales, window=window, stat=stat), equal_nan=True)
+
+    after_gap = (sales['Store'] == 2) & (sales['Date'] == '2013-01-31')
+    assert features.loc[after_gap, 'SalesLag1'].isna().all()
+    assert features.loc[after_gap, 'SalesLag7'].isna().all()
+
+
+def test_cumsum_rolling_matches_the_rolling_kernels_across_gaps(sales):
+    kernels = lf.add_lag_features(sales.copy(), lags=(), windows=(7,), ewm_spans=(), stats=('mean', 'std'))
+    cumsum = lf.add_lag_features(sales.copy(), lags=(), windows=(7,), ewm_spans=(), stats=('mean', 'std'),
+                                 cumsum=True)
+    for name in ('SalesRollMean7', 'SalesRollStd7'):
+        np.testing.assert_allclose(cumsum[name], kernels[name], equal_nan=True)
+
+
+def test_promo_runs_end_at_missing_days(sales):
+    sales = sales.sort_values(['Store', 'Date'])
+    sales['Promo'] = 1
+    features = lf.add_lag_features(sales.copy(), lags=(), windows=(), ewm_spans=())
+    store = features[features['Store'] == 2]
+    assert store.loc[store['Date'] == '2013-01-20', 'PromoRun'].item() == 20
+    assert store.loc[store['Date'] == '2013-01-31', 'PromoRun'].item() == 1
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import benchmarks
+
+lm = pytest.importorskip('lstm_model', exc_type=ImportError)  # Needs TensorFlow
+
+COLUMNS = ['Sales', 'Customers', 'Promo']
+
+
+@pytest.fixture
+def sales():
+    # Stores of unequal length, including one shorter than the window
+    data = benchmarks.make_synthetic_sales(n_stores=4, n_days=40, seed=0)
+    return data[(data['Store'] != 2) | (data['Date'] < data['Date'].min() + np.timedelta64(5, 'D'))]
+
+
+@pytest.mark.parametrize('time_step', [1, 7])
+def test_supervised_windows_match_the_legacy_loop(sales, time_step):
+    values = sales[COLUMNS].to_numpy()
+    expected_X, expected_y = benchmarks._legacy_supervised_data(values, time_step)
+    X, y = lm.create_supervised_data(values, time_step)
+    np.testing.assert_array_equal(X, expected_X)
+    np.testing.assert_array_equal(y, expected_y)
+
+
+def test_supervised_data_does_not_share_memory_with_the_input(sales):
+    values = sales[COLUMNS].to_numpy(dtype=np.float64)
+    original = values.copy()
+    X, y = lm.create_supervised_data(values, 7)
+    X /= 2
+    y[:] = 0
+    np.testing.assert_array_equal(values, original)
+
+
+def test_sliding_windows_are_read_only_views(sales):
+    values = sales[COLUMNS].to_numpy(dtype=np.float64)
+    X, y = lm.sliding_windows(values, 7)
+    assert np.shares_memory(X, values) and np.shares_memory(y, values)
+    assert not X.flags.writeable and not y.flags.writeable
+    assert values.flags.writeable
+
+
+def test_store_windows_never_cross_stores(sales):
+    time_step = 7
+    expected_X, expected_y, expected_stores = [], [], []
+    for store, group in sales.groupby('Store'):
+        store_X, store_y = benchmarks._legacy_supervised_data(group[COLUMNS].to_numpy(), time_step)
+        if not len(store_X):
+            continue
+        expected_X.extend(store_X)
+        expected_y.extend(store_y[:, 0])
+        expected_stores.extend([store] * len(store_X))
+
+    X, y, stores = lm.create_store_supervised_data(sales.sample(frac=1, random_state=0), time_step, COLUMNS)
+    np.testing.assert_array_equal(X, np.array(expected_X))
+    np.testing.assert_array_equal(y, expected_y)
+    np.testing.assert_array_equal(stores, expected_stores)
+
+
+def test_window_dataset_yields_the_gathered_windows(sales):
+    time_step = 7
+    values, _, y, starts, _ = lm.store_windows(sales, time_step, COLUMNS)
+    X_expected, y_expected, _ = lm.create_store_supervised_data(sales, time_step, COLUMNS)
+
+    batches = list(lm.window_dataset(values, y, starts, time_step, batch_size=16, shuffle=False))
+    np.testing.assert_array_equal(np.concatenate([X.numpy() for X, _ in batches]), X_expected)
+    np.testing.assert_array_equal(np.concatenate([y.numpy() for _, y in batches]), y_expected)
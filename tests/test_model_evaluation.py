@@ -0,0 +1,70 @@
+import logging
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmarks
+import data_processing as dp
+import model_evaluation as me
+import model_training as mt
+
+
+@pytest.fixture
+def sales():
+    return benchmarks.make_synthetic_dataset(2_000, days_per_store=200)[0]
+
+
+def test_backtest_drops_rows_with_invalid_dates(sales, caplog):
+    pipeline = mt.build_model_pipeline('hist_gradient_boosting', n_estimators=5)
+    expected, _ = me.backtest(pipeline, sales, n_folds=2, horizon=14, n_jobs=1)
+
+    with_invalid = sales.copy()
+    with_invalid['Date'] = with_invalid['Date'].astype('datetime64[ns]')
+    with_invalid = pd.concat([with_invalid, with_invalid.iloc[:1].assign(Date=pd.NaT)], ignore_index=True)
+    with caplog.at_level(logging.WARNING):
+        fold_metrics, _ = me.backtest(pipeline, with_invalid, n_folds=2, horizon=14, n_jobs=1)
+
+    assert 'Dropping 1 rows with invalid dates' in caplog.text
+    pd.testing.assert_frame_equal(fold_metrics.drop(columns='fit_s'), expected.drop(columns='fit_s'))
+
+
+def test_folds_reject_invalid_dates():
+    dates = pd.Series(pd.to_datetime(['2015-01-01', '2015-01-02', None]))
+    with pytest.raises(ValueError, match='invalid'):
+        me.rolling_origin_folds(dates, n_folds=1, horizon=1)
+
+
+def test_permutation_importance_keeps_feature_names_of_frame_fitted_models():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'signal': rng.random(1_000), 'noise': rng.random(1_000)})
+    data['Sales'] = 100 * data['signal']
+    X_train, X_test, y_train, y_test = dp.split_data(data, ['signal', 'noise'], 'Sales')
+    pipeline = mt.train_model(mt.build_model_pipeline(n_estimators=10, n_jobs=1, random_state=0), X_train, y_train)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        importance = me.feature_importance(pipeline, ['signal', 'noise'], method='permutation', X=X_test, y=y_test,
+                                           n_jobs=1)
+    importance = importance.set_index('Feature')['Importance']
+    assert importance['signal'] > 10 * max(importance['noise'], 1e-9)
+
+
+def test_permuted_columns_are_shuffled_jointly_and_alone():
+    class Recorder:
+        def __init__(self):
+            self.seen = []
+
+        def predict(self, X):
+            self.seen.append(np.array(X))
+            return np.zeros(len(X))
+
+    X = np.arange(40, dtype=np.float64).reshape(10, 4)
+    recorder = Recorder()
+    me._permutation_scores(recorder, X, np.zeros(10), [1, 2], ['a', 'b', 'c', 'd'], n_repeats=2, seed=0)
+    for permuted in recorder.seen:
+        np.testing.assert_array_equal(permuted[:, [0, 3]], X[:, [0, 3]])
+        # Both columns moved with the same row permutation
+        np.testing.assert_array_equal(permuted[:, 2] - permuted[:, 1], X[:, 2] - X[:, 1])
+        assert sorted(permuted[:, 1]) == sorted(X[:, 1])
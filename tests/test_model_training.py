@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+import model_training as mt
+
+
+@pytest.fixture
+def regression_data():
+    rng = np.random.default_rng(0)
+    X = rng.random((500, 4))
+    return X, X @ np.arange(1, 5)
+
+
+@pytest.mark.parametrize('backend', ['random_forest', 'hist_gradient_boosting'])
+def test_update_model_grows_the_model(regression_data, backend):
+    X, y = regression_data
+    pipeline = mt.train_model(mt.build_model_pipeline(backend, n_estimators=5, random_state=0), X, y)
+    mt.update_model(pipeline, X[:100], y[:100], n_new_estimators=3)
+
+    model = pipeline.named_steps['model']
+    size = len(model.estimators_) if backend == 'random_forest' else model.n_iter_
+    assert size == 8
+
+
+@pytest.mark.parametrize('backend', ['random_forest', 'hist_gradient_boosting'])
+def test_retrain_after_update_is_a_full_retrain(regression_data, backend):
+    X, y = regression_data
+    fresh = mt.train_model(mt.build_model_pipeline(backend, n_estimators=5, random_state=0), X, y)
+
+    pipeline = mt.train_model(mt.build_model_pipeline(backend, n_estimators=5, random_state=0), X, y)
+    mt.update_model(pipeline, X[:100], y[:100], n_new_estimators=3)
+    model = pipeline.named_steps['model']
+    assert model.get_params()['warm_start'] is False
+
+    mt.train_model(pipeline, X, y)
+    size = len(model.estimators_) if backend == 'random_forest' else model.n_iter_
+    assert size == 5
+    np.testing.assert_allclose(pipeline.predict(X), fresh.predict(X))
@@ -0,0 +1,41 @@
+import logging
+
+import joblib
+import numpy as np
+import pytest
+
+import benchmarks
+import data_processing as dp
+import model_training as mt
+import prediction_service as ps
+
+
+@pytest.fixture
+def sales():
+    return benchmarks.make_synthetic_dataset(2_000, days_per_store=200)[0]
+
+
+def _save(pipeline, tmp_path):
+    path = str(tmp_path / 'model_test.pkl')
+    joblib.dump(pipeline, path)
+    return path
+
+
+def test_model_with_features_step_is_served_from_raw_requests(sales, tmp_path, caplog):
+    pipeline = mt.build_model_pipeline(n_estimators=5, n_jobs=1, random_state=0, features=dp.FeatureTransformer())
+    pipeline = mt.train_model(pipeline, sales, sales['Sales'])
+    test = sales.drop(columns=['Sales', 'Customers'])
+
+    with caplog.at_level(logging.WARNING):
+        service = ps.PredictionService(_save(pipeline, tmp_path))
+    assert not caplog.records
+    np.testing.assert_allclose(service.predict(test), pipeline.predict(test))
+
+
+def test_model_without_features_step_warns_about_unscaled_features(sales, tmp_path, caplog):
+    X = dp.FeatureTransformer(scale=False).fit_transform(sales)
+    pipeline = mt.train_model(mt.build_model_pipeline(n_estimators=5, n_jobs=1, random_state=0), X, sales['Sales'])
+
+    with caplog.at_level(logging.WARNING):
+        ps.PredictionService(_save(pipeline, tmp_path))
+    assert any('no fitted features step' in record.getMessage() for record in caplog.records)